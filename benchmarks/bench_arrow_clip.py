@@ -0,0 +1,72 @@
+# 箭头裁剪微基准：旧的 2% 步进循环 vs. Liang–Barsky 解析解（单个 / 批量）
+# 用法: python benchmarks/bench_arrow_clip.py [pairs]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from final import clip_arrow, clip_arrows, np
+
+
+def step_clip(sx, sy, rx, ry, rw, rh):
+	# 原 PointerCell.update_arrow 中起点在外部时的逐步回退
+	def contains(x, y):
+		return rx < x < rx + rw and ry < y < ry + rh
+	dx = rx + rw/2 - sx
+	dy = ry + rh/2 - sy
+	end_x = rx + rw/2
+	end_y = ry + rh/2
+	ratio = 1.0
+	while contains(end_x, end_y) and ratio > 0:
+		ratio = ratio - 0.02
+		end_y = sy + dy * ratio
+		end_x = sx + dx * ratio
+	return end_x, end_y
+
+
+def make_pairs(n, seed=1):
+	# 只生成起点在目标外部的组合，这正是旧代码走步进循环的分支
+	rnd = random.Random(seed)
+	pairs = []
+	while len(pairs) < n:
+		rx, ry = rnd.uniform(0, 2000), rnd.uniform(0, 2000)
+		rw, rh = rnd.choice([(120, 60), (230, 120), (440, 120), (150, 400)])
+		sx, sy = rnd.uniform(-200, 2400), rnd.uniform(-200, 2400)
+		if rx <= sx <= rx + rw and ry <= sy <= ry + rh:
+			continue
+		pairs.append((sx, sy, rx, ry, rw, rh))
+	return pairs
+
+
+def timeit(fn, repeat=5):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	pairs = make_pairs(n)
+	columns = list(zip(*pairs))
+
+	results = [
+		('step loop', timeit(lambda: [step_clip(*p) for p in pairs])),
+		('liang-barsky', timeit(lambda: [clip_arrow(*p) for p in pairs])),
+		('liang-barsky batch' + ('' if np is not None else ' (no numpy)'),
+			timeit(lambda: clip_arrows(*columns))),
+	]
+	base = results[0][1]
+	print(f"{n} pointer/target pairs")
+	for name, t in results:
+		print(f"  {name:<28} {t*1000:9.2f} ms   x{base/t:6.1f}")
+
+	worst = max(abs(a - b) for p in pairs for a, b in zip(step_clip(*p), clip_arrow(*p)))
+	print(f"  max endpoint difference vs. step loop: {worst:.2f} px")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,38 @@
+# 脚本接口建板耗时：无界面生成链表、二叉树、散列表（含结束时的布局与箭头）
+# 参考：一万节点单向链表约 0.75 s（约 75 us/节点），双向链表与散列表约 1.2–1.4 s，二叉树约 1.9–2.2 s
+# 用法: python benchmarks/bench_build.py [nodes]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from final import Board
+
+
+def best_of(fn, repeat=5):
+	best = float('inf')
+	for _ in range(repeat):
+		board = Board()
+		start = time.perf_counter()
+		fn(board)
+		board.canvas.update_idletasks()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	cases = [
+		('linked list', lambda board: board.linked_list(range(n))),
+		('doubly linked list', lambda board: board.linked_list(range(n), doubly=True)),
+		('binary tree', lambda board: board.binary_tree(range(n))),
+		('hash table', lambda board: board.hash_table({f"key{i}": i for i in range(n)}, buckets=n // 8 or 1)),
+	]
+	print(f"{n} nodes, headless")
+	for name, fn in cases:
+		t = best_of(fn)
+		print(f"  {name:<20} {t*1000:9.1f} ms   {t/n*1e6:6.1f} us/node")
+
+
+if __name__ == '__main__':
+	main()
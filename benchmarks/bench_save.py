@@ -0,0 +1,69 @@
+# 保存耗时 vs. 嵌套深度：旧的 collect_elements + json.dump 与单遍流式写出对比
+# 用法: python benchmarks/bench_save.py [elements]
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from final import DataCell, NullCanvas, StructBlock, Volume, board_records, write_board_json
+
+
+def build_board(total, depth):
+	# 每条链是 depth 层嵌套的 StructBlock，每层带一个 DataCell
+	canvas = NullCanvas()
+	elements = []
+	for _ in range(max(1, total // (2 * depth))):
+		root = parent = StructBlock(canvas, 0, 0)
+		for level in range(depth):
+			parent.add_element(DataCell(canvas, 0, 0, "Data", str(level)))
+			if level < depth - 1:
+				child = StructBlock(canvas, 0, 0)
+				parent.add_element(child)
+				parent = child
+		elements.append(root)
+	return elements
+
+
+def legacy_save(elements, f):
+	# 修改前的 save_to_file：to_dict 已递归一遍，collect_elements 又递归一遍
+	def collect_elements(elements):
+		data = []
+		for elem in elements:
+			elem_data = elem.to_dict()
+			if isinstance(elem, Volume):
+				elem_data["elements"] = collect_elements(elem.elements)
+			data.append(elem_data)
+		return data
+	json.dump(collect_elements(elements), f, indent=2)
+
+
+def streaming_save(elements, f, indent=2):
+	records, parents = board_records(elements)
+	write_board_json(f, records, parents, indent)
+
+
+def best_of(fn, repeat=3):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main():
+	total = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+	print(f"~{total} elements per board; times in ms")
+	print(f"{'depth':>6} {'legacy':>10} {'single-pass':>12} {'compact':>10} {'speedup':>8}")
+	for depth in (1, 5, 25, 50, 100, 200):
+		elements = build_board(total, depth)
+		legacy = best_of(lambda: legacy_save(elements, io.StringIO()))
+		new = best_of(lambda: streaming_save(elements, io.StringIO()))
+		compact = best_of(lambda: streaming_save(elements, io.StringIO(), None))
+		print(f"{depth:>6} {legacy*1000:>10.1f} {new*1000:>12.1f} {compact*1000:>10.1f} {legacy/new:>7.1f}x")
+
+
+if __name__ == '__main__':
+	main()
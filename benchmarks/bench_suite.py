@@ -0,0 +1,315 @@
+# 基准套件：在合成画板（长链表、深层嵌套结构体、大栈、密集指针汇聚、放大的 tree_example）上
+# 计时用脚本接口建板、读档、存档、命中测试、力导向布局与栈的压入/弹出；有 Tk 时（没有显示器就尝试启动 Xvfb）再测 refresh_all 与拖动。
+# 结果写成 JSON 并与基线比较，比基线慢超过阈值的项记为退步，退出码为 1
+# 用法: python benchmarks/bench_suite.py [--scale S] [--repeat N] [--only 子串]
+#                                        [--output results.json] [--baseline FILE] [--threshold 0.25]
+#                                        [--update-baseline]
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+from final import Board, DataCell, StackQueue, tk
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+EXAMPLE = os.path.join(HERE, '..', 'tree_example.json')
+NOISE = 0.002	# 低于 2 ms 的差值视为计时抖动，不算退步
+
+
+class Event:
+	# 只带 on_click / on_drag 读取的字段
+	def __init__(self, x, y, state=0):
+		self.x = self.x_root = x
+		self.y = self.y_root = y
+		self.state = state
+
+
+def best_of(fn, repeat, setup=None):
+	# setup 每轮重新准备状态，不计入耗时
+	best = float('inf')
+	for _ in range(repeat):
+		state = setup() if setup else None
+		start = time.perf_counter()
+		fn(state)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+# ---- 合成画板 ----
+
+def linked_list(board, scale):
+	board.linked_list(range(2000 * scale))
+
+
+def deep_nesting(board, scale):
+	# 一条 depth 层的嵌套结构体链，每层带一个数据单元，共 scale 条
+	with board.batch():
+		for chain in range(scale):
+			parent = None
+			for level in range(200):
+				parent = board.struct(x=chain * 400, y=0, parent=parent)
+				board.data_cell(level, parent=parent)
+
+
+def big_stack(board, scale):
+	board.stack(range(5000 * scale), x=100, y=100)
+
+
+def pointer_hub(board, scale):
+	# 大量顶层指针指向同一个结构体，汇聚点的入边很多
+	with board.batch():
+		hub, _ = board.node("hub", x=100, y=100)
+		for i in range(2000 * scale):
+			board.pointer(hub, f"p{i}", 100 + (i % 50) * 140, 300 + (i // 50) * 80)
+
+
+def tree_examples(board, scale):
+	# tree_example.json 按网格复制 50 * scale 份，指针在每份内部改指副本
+	source = Board()
+	source.load_from_file(EXAMPLE)
+	clip = source.copy_records(source.elements)
+	for i in range(50 * scale):
+		board.paste(clip, (i % 5) * 1600, (i // 5) * 700)
+
+
+BOARDS = [
+	('linked_list', linked_list),
+	('deep_nesting', deep_nesting),
+	('big_stack', big_stack),
+	('pointer_hub', pointer_hub),
+	('tree_examples', tree_examples),
+]
+FORCE_BOARDS = ('linked_list', 'pointer_hub', 'tree_examples')
+
+
+def bounds(board):
+	x1 = min(elem.x for elem in board.elements)
+	y1 = min(elem.y for elem in board.elements)
+	x2 = max(elem.x + elem.width for elem in board.elements)
+	y2 = max(elem.y + elem.height for elem in board.elements)
+	return x1, y1, x2, y2
+
+
+def loaded(path):
+	board = Board()
+	board.load_from_file(path)
+	board.canvas.update_idletasks()
+	return board
+
+
+# ---- 无界面用例 ----
+
+def headless_cases(name, path, workdir, repeat):
+	results = {}
+
+	def load(_):
+		loaded(path)
+	results[f'{name}.load'] = best_of(load, repeat)
+
+	board = loaded(path)
+	out = os.path.join(workdir, name + '.out.json')
+	results[f'{name}.save'] = best_of(lambda _: board.save_to_file(out), repeat)
+
+	# on_drag 拖指针时对每个鼠标位置做的命中测试
+	rnd = random.Random(1)
+	x1, y1, x2, y2 = bounds(board)
+	points = [(rnd.uniform(x1, x2), rnd.uniform(y1, y2)) for _ in range(20000)]
+
+	def hits(_):
+		for x, y in points:
+			board.index.hits(x, y)
+	results[f'{name}.hit_20k'] = best_of(hits, repeat)
+
+	if name in FORCE_BOARDS:
+		# 对全部顶层对象做一次同步的力导向布局（含计算与移动）
+		def force(board):
+			board.arrange(board.elements, method='force')
+			board.canvas.update_idletasks()
+		results[f'{name}.force_layout'] = best_of(force, repeat, lambda: loaded(path))
+
+	if any(isinstance(elem, StackQueue) for elem in board.elements):
+		# 每次压入/弹出后都处理一轮空闲任务，和界面上逐次操作一样
+		def push_pop(board):
+			stack = next(elem for elem in board.elements if isinstance(elem, StackQueue))
+			for i in range(50):
+				board.attach(DataCell(board.canvas, 0, 0, "Data", str(i)), stack)
+				board.canvas.update_idletasks()
+			for _ in range(50):
+				board.pop(stack)
+				board.canvas.update_idletasks()
+		results[f'{name}.push_pop_50'] = best_of(push_pop, repeat, lambda: loaded(path))
+	return results
+
+
+# ---- 需要 Tk 的用例 ----
+
+def start_display():
+	# 有显示器直接用；否则找得到 Xvfb 就起一个虚拟显示器。返回 (是否可用, 要结束的进程)
+	if tk is None:
+		return False, None
+	if os.environ.get('DISPLAY'):
+		return True, None
+	xvfb = shutil.which('Xvfb')
+	if not xvfb:
+		return False, None
+	display = ':%d' % (90 + os.getpid() % 100)
+	proc = subprocess.Popen([xvfb, display, '-screen', '0', '1280x1024x24'],
+		stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	os.environ['DISPLAY'] = display
+	for _ in range(50):
+		try:
+			tk.Tk().destroy()
+			return True, proc
+		except tk.TclError:
+			time.sleep(0.1)
+	proc.terminate()
+	return False, None
+
+
+def tk_cases(name, path, repeat):
+	from final import DataStructureCanvas
+	root = tk.Tk()
+	try:
+		app = DataStructureCanvas(root, autosave_dir=None)
+		app.load_from_file(path)
+		root.update()
+		results = {}
+
+		def refresh(_):
+			app.refresh_all()
+			root.update_idletasks()
+		results[f'{name}.refresh_all'] = best_of(refresh, repeat)
+
+		# 按住最上面的顶层对象拖动 100 帧：每帧一个 on_drag 事件，再立即应用本帧位移
+		elem = app.board.elements[-1]
+		x = elem.x + 5 - app.canvas.canvasx(0)
+		y = elem.y + 5 - app.canvas.canvasy(0)
+
+		def drag(_):
+			app.on_click(Event(x, y))
+			for step in range(1, 101):
+				app.on_drag(Event(x + step, y + step % 7))
+				if app.drag_pending is not None:
+					app.canvas.after_cancel(app.drag_pending)
+					app.apply_drag()
+				root.update_idletasks()
+			app.on_release(Event(x + 100, y))
+			app.history.undo()
+			root.update_idletasks()
+		results[f'{name}.drag_100'] = best_of(drag, repeat)
+		return results
+	finally:
+		root.destroy()
+
+
+# ---- 结果与基线 ----
+
+def compare(results, baseline, threshold):
+	# 返回退步的用例名；只比较两边都有的项
+	regressions = []
+	print(f"{'case':<32}{'baseline':>12}{'now':>12}{'change':>10}")
+	for case, now in results.items():
+		base = baseline.get(case)
+		if base is None:
+			print(f"{case:<32}{'-':>12}{now*1000:10.1f}ms{'new':>10}")
+			continue
+		change = now / base - 1 if base else 0.0
+		slow = change > threshold and now - base > NOISE
+		if slow:
+			regressions.append(case)
+		flag = '  REGRESSION' if slow else ''
+		print(f"{case:<32}{base*1000:10.1f}ms{now*1000:10.1f}ms{change*100:+9.1f}%{flag}")
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="benchmark suite with baseline comparison")
+	parser.add_argument('--scale', type=int, default=1, help="multiply the synthetic board sizes")
+	parser.add_argument('--repeat', type=int, default=3, help="runs per case; the best one counts")
+	parser.add_argument('--only', help="run only the cases whose name contains this text")
+	parser.add_argument('--output', help="write the results to this JSON file")
+	parser.add_argument('--baseline', default=BASELINE, help="baseline JSON to compare against")
+	parser.add_argument('--threshold', type=float, default=0.25,
+		help="allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+	parser.add_argument('--update-baseline', action='store_true', help="store the results as the new baseline")
+	args = parser.parse_args()
+
+	display, xvfb = start_display()
+	results = {}
+	skipped = []
+	workdir = tempfile.mkdtemp(prefix='bench_suite_')
+	try:
+		for name, build in BOARDS:
+			if args.only and args.only not in name:
+				continue
+			board = Board()
+			build(board, args.scale)
+			# 建板（含批量结束时的布局与箭头）；linked_list 在 --scale 5 时就是 bench_build.py 的一万节点链表
+			def rebuild(_):
+				board = Board()
+				build(board, args.scale)
+				board.canvas.update_idletasks()
+			results[f'{name}.build'] = best_of(rebuild, args.repeat)
+			path = os.path.join(workdir, name + '.json')
+			board.save_to_file(path)
+			results.update(headless_cases(name, path, workdir, args.repeat))
+			if display:
+				results.update(tk_cases(name, path, args.repeat))
+			else:
+				skipped += [f'{name}.refresh_all', f'{name}.drag_100']
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+		if xvfb is not None:
+			xvfb.terminate()
+	if args.only:
+		results = {case: t for case, t in results.items() if args.only in case}
+		skipped = [case for case in skipped if args.only in case]
+
+	report = {
+		'python': platform.python_version(),
+		'machine': platform.machine(),
+		'scale': args.scale,
+		'results': results,
+		'skipped': skipped,
+	}
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(report, f, indent=2)
+
+	baseline = {}
+	if os.path.exists(args.baseline):
+		with open(args.baseline) as f:
+			stored = json.load(f)
+		if stored.get('scale') == args.scale:
+			baseline = stored['results']
+		else:
+			print(f"baseline was recorded at scale {stored.get('scale')}, not comparing")
+	regressions = compare(results, baseline, args.threshold)
+	if skipped:
+		print(f"skipped {len(skipped)} Tk cases (no display and no Xvfb)")
+
+	if args.update_baseline:
+		if os.path.exists(args.baseline):
+			with open(args.baseline) as f:
+				stored = json.load(f)
+			if stored.get('scale') == args.scale:
+				# --only 时只覆盖跑过的项
+				report['results'] = dict(stored['results'], **results)
+		with open(args.baseline, 'w') as f:
+			json.dump(report, f, indent=2)
+		print(f"baseline written to {args.baseline}")
+	elif regressions:
+		print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -1,9 +1,45 @@
-import tkinter as tk
-from tkinter import ttk, simpledialog, Menu, filedialog
+try:
+	import tkinter as tk
+	from tkinter import ttk, simpledialog, Menu, filedialog, messagebox
+except ImportError:
+	# 没有 Tk 的服务器上仍可用 Board + NullCanvas 处理画板文件
+	tk = None
 from collections import deque
-import copy
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import argparse
+import codecs
+import html
 import json
+import glob
+import math
+import os
+import queue
+import random
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
 import uuid
+import zlib
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+try:
+	import ijson
+except ImportError:
+	ijson = None
+
+try:
+	import cairosvg
+except ImportError:
+	cairosvg = None
 
 
 COLORS = {
@@ -16,20 +52,727 @@ COLORS = {
 	'arrow':		'#616161'
 }
 
+# 图元最多带上最近几层容器的分组标签，极深的嵌套不会让每个图元的标签无限增长
+GROUP_DEPTH = 16
+SELECTION_TAG = 'selection'	# 多选拖动时被选中的顶层对象的图元共用的标签
+
+
+class SpatialIndex:
+	# 均匀网格空间索引：按元素包围盒分桶，命中测试只检查鼠标所在格子里的元素
+	def __init__(self, cell_size=128):
+		self.cell_size = cell_size
+		self.cells = {}
+		self.spans = {}
+		self.stamps = {}
+		self._stamp = 0
+
+	def _span(self, x1, y1, x2, y2):
+		# 每个元素只记下它覆盖的格子范围（四个小整数），不另存包围盒与格子列表
+		s = self.cell_size
+		return (int(x1 // s), int(y1 // s), int(x2 // s), int(y2 // s))
+
+	def _keys(self, span):
+		cx1, cy1, cx2, cy2 = span
+		return [(cx, cy)
+				for cx in range(cx1, cx2 + 1)
+				for cy in range(cy1, cy2 + 1)]
+
+	def update(self, elem):
+		# 建板、拖动时调用最频繁，格子范围的计算直接展开
+		s = self.cell_size
+		x = elem.x
+		y = elem.y
+		span = (int(x // s), int(y // s), int((x + elem.width) // s), int((y + elem.height) // s))
+		if elem not in self.stamps:
+			self.raise_(elem)
+		old = self.spans.get(elem)
+		if old == span:
+			return
+		cells = self.cells
+		if old is not None:
+			for key in self._keys(old):
+				bucket = cells[key]
+				bucket.discard(elem)
+				if not bucket:
+					del cells[key]
+		for cx in range(span[0], span[2] + 1):
+			for cy in range(span[1], span[3] + 1):
+				bucket = cells.get((cx, cy))
+				if bucket is None:
+					cells[cx, cy] = {elem}
+				else:
+					bucket.add(elem)
+		self.spans[elem] = span
+
+	def remove(self, elem):
+		span = self.spans.pop(elem, None)
+		if span is not None:
+			for key in self._keys(span):
+				bucket = self.cells[key]
+				bucket.discard(elem)
+				if not bucket:
+					del self.cells[key]
+		self.stamps.pop(elem, None)
+
+	def __contains__(self, elem):
+		return elem in self.spans
+
+	def raise_(self, elem):
+		# 元素被重新放到最上层（新建、放入/移出容器）时刷新其绘制顺序
+		self._stamp += 1
+		self.stamps[elem] = self._stamp
+
+	def clear(self):
+		self.cells.clear()
+		self.spans.clear()
+		self.stamps.clear()
+
+	def paint_order(self, elem):
+		# 与 get_all_elements 一致：先按顶层元素的先后，再按嵌套深度，子元素画在父元素之上
+		depth = 0
+		root = elem
+		while root.parent is not None:
+			root = root.parent
+			depth += 1
+		return (self.stamps.get(root, 0), depth, self.stamps.get(elem, 0))
+
+	def hits(self, x, y):
+		# 返回包含 (x, y) 的所有元素，按绘制顺序从下到上排列
+		s = self.cell_size
+		bucket = self.cells.get((int(x // s), int(y // s)))
+		if not bucket:
+			return []
+		found = [elem for elem in bucket if elem.contains(x, y)]
+		found.sort(key=self.paint_order)
+		return found
+
+	def hit(self, x, y):
+		found = self.hits(x, y)
+		return found[-1] if found else None
+
+	def query_rect(self, x1, y1, x2, y2):
+		# 返回包围盒与矩形相交的所有元素
+		result = set()
+		for key in self._keys(self._span(x1, y1, x2, y2)):
+			bucket = self.cells.get(key)
+			if bucket:
+				result.update(bucket)
+		return [elem for elem in result
+				if elem.x < x2 and elem.x + elem.width > x1
+				and elem.y < y2 and elem.y + elem.height > y1]
+
+def clip_arrow(sx, sy, rx, ry, rw, rh):
+	# 从指针圆点 (sx, sy) 指向矩形中心，求箭头终点
+	cx = rx + rw/2
+	cy = ry + rh/2
+	dx = cx - sx
+	dy = cy - sy
+	if rx < sx < rx + rw and ry < sy < ry + rh:
+		# 起点在目标内部：沿主方向落到边上
+		if abs(dx) > abs(dy):
+			edge_x = rx if dx > 0 else rx + rw
+			ratio = (edge_x - sx) / dx if dx != 0 else 0
+			return edge_x, sy + dy * ratio
+		edge_y = ry if dy > 0 else ry + rh
+		ratio = (edge_y - sy) / dy if dy != 0 else 0
+		return sx + dx * ratio, edge_y
+	# 起点在外部：Liang–Barsky 求线段进入矩形时的参数 t
+	t = 0.0
+	if dx > 0:
+		t = max(t, (rx - sx) / dx)
+	elif dx < 0:
+		t = max(t, (rx + rw - sx) / dx)
+	if dy > 0:
+		t = max(t, (ry - sy) / dy)
+	elif dy < 0:
+		t = max(t, (ry + rh - sy) / dy)
+	t = min(t, 1.0)
+	return sx + dx * t, sy + dy * t
+
+
+def clip_arrows(sx, sy, rx, ry, rw, rh):
+	# clip_arrow 的批量版本，参数为等长序列；有 NumPy 时一次向量化计算
+	if np is None:
+		return [clip_arrow(*args) for args in zip(sx, sy, rx, ry, rw, rh)]
+	sx, sy, rx, ry, rw, rh = (np.asarray(v, dtype=float) for v in (sx, sy, rx, ry, rw, rh))
+	cx = rx + rw/2
+	cy = ry + rh/2
+	dx = cx - sx
+	dy = cy - sy
+	with np.errstate(divide='ignore', invalid='ignore'):
+		tx = np.where(dx > 0, (rx - sx) / dx, np.where(dx < 0, (rx + rw - sx) / dx, 0.0))
+		ty = np.where(dy > 0, (ry - sy) / dy, np.where(dy < 0, (ry + rh - sy) / dy, 0.0))
+		t = np.minimum(np.maximum(np.maximum(tx, ty), 0.0), 1.0)
+		ex = sx + dx * t
+		ey = sy + dy * t
+
+		inside = (rx < sx) & (sx < rx + rw) & (ry < sy) & (sy < ry + rh)
+		horizontal = np.abs(dx) > np.abs(dy)
+		edge_x = np.where(dx > 0, rx, rx + rw)
+		ratio_x = np.where(dx != 0, (edge_x - sx) / dx, 0.0)
+		edge_y = np.where(dy > 0, ry, ry + rh)
+		ratio_y = np.where(dy != 0, (edge_y - sy) / dy, 0.0)
+		ix = np.where(horizontal, edge_x, sx + dx * ratio_y)
+		iy = np.where(horizontal, sy + dy * ratio_x, edge_y)
+	ex = np.where(inside, ix, ex)
+	ey = np.where(inside, iy, ey)
+	return list(zip(ex.tolist(), ey.tolist()))
+
+
+class ArrowRouter:
+	# 箭头脏集合：几何变化时只登记指针，每帧空闲时统一用 coords() 刷新一次。
+	# 按登记顺序刷新（dict 当作有序集合），新箭头的叠放顺序每次都一样，导出的文件可以复现
+	def __init__(self, canvas):
+		self.canvas = canvas
+		self.dirty = {}
+		self.pending = None
+		self.restack = False
+
+	def mark(self, pointer):
+		self.dirty[pointer] = None
+		if self.pending is None:
+			self.pending = self.canvas.after_idle(self.flush)
+
+	def raise_arrows(self):
+		# 其他图元被提到上层后，下一帧把箭头重新提到最上面
+		self.restack = True
+		if self.pending is None:
+			self.pending = self.canvas.after_idle(self.flush)
+
+	def discard(self, pointer):
+		self.dirty.pop(pointer, None)
+
+	def flush(self):
+		if self.pending is not None:
+			self.canvas.after_cancel(self.pending)
+			self.pending = None
+		dirty, self.dirty = self.dirty, {}
+		routed = []
+		for pointer in dirty:
+			if pointer.target:
+				routed.append(pointer)
+			else:
+				pointer.update_arrow()
+		if len(routed) > 1:
+			# 一次批量裁剪所有脏箭头
+			ends = clip_arrows(
+				[p.x + 60 for p in routed], [p.y + 30 for p in routed],
+				[p.target.x for p in routed], [p.target.y for p in routed],
+				[p.target.width for p in routed], [p.target.height for p in routed])
+			for pointer, (end_x, end_y) in zip(routed, ends):
+				pointer.set_arrow(end_x, end_y)
+		elif routed:
+			routed[0].update_arrow()
+		if dirty or self.restack:
+			self.restack = False
+			self.canvas.tag_raise('arrow')
+
+
+class EdgeIndex:
+	# 指针关系的双向索引：正向 指针 -> 目标 存在 pointer.target，反向 目标 -> 指针集合 存在这里。
+	# 改指向、删除都是 O(1)，成千上万个指针指向同一个节点时也不用线性查找
+	def __init__(self):
+		self.sources = {}
+
+	def link(self, pointer, target):
+		old = pointer.target
+		if old is target:
+			return
+		if old is not None:
+			self.unlink(pointer)
+		pointer.target = target
+		if target is not None:
+			sources = self.sources.get(target)
+			if sources is None:
+				sources = self.sources[target] = set()
+			sources.add(pointer)
+
+	def unlink(self, pointer):
+		target = pointer.target
+		if target is None:
+			return
+		pointer.target = None
+		sources = self.sources.get(target)
+		if sources is not None:
+			sources.discard(pointer)
+			if not sources:
+				del self.sources[target]
+
+	def pointers_to(self, elem):
+		return self.sources.get(elem, ())
+
+	def in_degree(self, elem):
+		return len(self.sources.get(elem, ()))
+
+	def pointers_into(self, root):
+		# 指向 root 子树中任一元素的所有指针
+		found = set()
+		stack = [root]
+		while stack:
+			elem = stack.pop()
+			found.update(self.sources.get(elem, ()))
+			if isinstance(elem, Volume):
+				stack.extend(elem.elements)
+		return found
+
+	def dangling(self, index):
+		# 目标已不在画板上的指针；删除时会清理，正常情况下为空
+		return [pointer for target, sources in self.sources.items()
+			if target not in index for pointer in sources]
+
+	def clear(self):
+		self.sources.clear()
+
+
+class LayoutEngine:
+	# 延迟布局：容器变动时只标脏（连同祖先），在空闲时或批量操作结束时统一测量、排布一次
+	def __init__(self, canvas):
+		self.canvas = canvas
+		self.dirty = set()
+		self.arranging = set()
+		self.pending = None
+		self.depth = 0
+
+	def mark(self, volume):
+		while volume is not None and volume not in self.dirty:
+			self.dirty.add(volume)
+			volume = volume.parent
+		if self.depth == 0 and self.pending is None:
+			self.pending = self.canvas.after_idle(self.flush)
+
+	def discard(self, volume):
+		self.dirty.discard(volume)
+
+	def flush(self):
+		if self.pending is not None:
+			self.canvas.after_cancel(self.pending)
+			self.pending = None
+		if not self.dirty:
+			return
+		dirty, self.dirty = self.dirty, set()
+		depths = {}
+		def depth(volume):
+			chain = []
+			while volume is not None and volume not in depths:
+				chain.append(volume)
+				volume = volume.parent
+			n = depths[volume] if volume is not None else -1
+			for volume in reversed(chain):
+				n += 1
+				depths[volume] = n
+			return n
+		ordered = sorted(dirty, key=depth)
+		# 先自底向上测量尺寸，再自顶向下排布；每个脏容器只处理一次
+		for volume in reversed(ordered):
+			volume.measure()
+		fresh = [volume for volume in ordered if not volume.id]
+		self.arranging = dirty
+		try:
+			for volume in ordered:
+				volume.draw()
+		finally:
+			self.arranging = set()
+		fresh = [volume for volume in fresh if volume.id]
+		if fresh:
+			self.restack(fresh)
+
+	def restack(self, fresh):
+		# 批量里新建的容器在子元素之后才画出，外框会盖住子元素：
+		# 从这些容器所在的最早的顶层对象起，按顶层列表的顺序重新叠放一次，绘制顺序随之更新
+		board = getattr(self.canvas, 'board', None)
+		if board is None:
+			return
+		roots = set()
+		seen = set()
+		for volume in fresh:
+			while volume not in seen:
+				seen.add(volume)
+				if volume.parent is None:
+					roots.add(volume)
+					break
+				volume = volume.parent
+		elements = board.elements
+		first = next((i for i, elem in enumerate(elements) if elem in roots), len(elements))
+		for elem in elements[first:]:
+			board.index.raise_(elem)
+			elem.lift()
+		board.arrow_router.raise_arrows()
+
+	@contextmanager
+	def batch(self):
+		self.depth += 1
+		try:
+			yield
+		finally:
+			self.depth -= 1
+			if self.depth == 0:
+				self.flush()
+				router = getattr(self.canvas, 'arrow_router', None)
+				if router is not None:
+					router.flush()
+
+
+DETAIL_HIDDEN, DETAIL_BLOCK, DETAIL_FULL = 0, 1, 2
+
+
+class Viewport:
+	# 视口裁剪：只有可见区域（外加一圈边距）里的元素才持有画布图元，其余只保留几何与索引。
+	# 落在边距里或缩放后太小的容器按细节层次只画一个外框，子元素和文字都不创建
+	def __init__(self, canvas, index, margin=200, min_detail=24):
+		self.canvas = canvas
+		self.index = index
+		self.margin = margin
+		self.min_detail = min_detail
+		self.scale = 1.0
+		self.rect = None
+		self.extent = None
+		self.region = None
+		self.region_scale = None
+		self.live = {}
+		self.touched = set()
+		self.pending = None
+
+	def visible_rect(self):
+		width = self.canvas.winfo_width()
+		height = self.canvas.winfo_height()
+		if width <= 1 or height <= 1:
+			return None	# 窗口还没显示出来，暂不裁剪
+		return (self.canvas.canvasx(0), self.canvas.canvasy(0),
+				self.canvas.canvasx(width), self.canvas.canvasy(height))
+
+	def near(self, elem):
+		m = self.margin / self.scale
+		x1, y1, x2, y2 = self.rect
+		return (elem.x < x2 + m and elem.x + elem.width > x1 - m and
+				elem.y < y2 + m and elem.y + elem.height > y1 - m)
+
+	def collapsed(self, volume):
+		# 完全落在边距里，或缩放后小于 min_detail 像素的容器只画外框
+		x1, y1, x2, y2 = self.rect
+		return (min(volume.width, volume.height) * self.scale < self.min_detail or
+				not (volume.x < x2 and volume.x + volume.width > x1 and
+					volume.y < y2 and volume.y + volume.height > y1))
+
+	def level(self, elem):
+		if self.rect is None:
+			return DETAIL_FULL
+		if not self.near(elem):
+			# 指向可见元素的指针仍要画出来，箭头才不会凭空消失
+			target = getattr(elem, 'target', None)
+			if target is None or not self.near(target):
+				return DETAIL_HIDDEN
+		parent = elem.parent
+		while parent is not None:
+			if self.collapsed(parent):
+				return DETAIL_HIDDEN
+			parent = parent.parent
+		if isinstance(elem, Volume) and elem.elements and self.collapsed(elem):
+			return DETAIL_BLOCK
+		return DETAIL_FULL
+
+	def claim(self, elem):
+		# 元素绘制前询问自己的细节层次，并登记为持有图元
+		level = self.level(elem)
+		old = self.live.get(elem, DETAIL_HIDDEN)
+		if level:
+			self.live[elem] = level
+			if not elem.id:
+				self.route(elem)
+		else:
+			self.live.pop(elem, None)
+			if elem.id:
+				elem.hide()
+		if level < old and isinstance(elem, Volume):
+			self.collapse(elem)
+		return level
+
+	def route(self, elem):
+		# 元素要重新创建图元（滚动、平移回视口或容器展开）：隐藏时删掉的箭头不会自己回来，
+		# 把它自己的箭头和指向它的箭头都登记到箭头路由，本帧空闲时重画
+		router = getattr(self.canvas, 'arrow_router', None)
+		if router is None:
+			return
+		if getattr(elem, 'target', None) is not None:
+			router.mark(elem)
+		for pointer in elem.incoming():
+			router.mark(pointer)
+
+	def collapse(self, volume):
+		stack = list(volume.elements)
+		while stack:
+			elem = stack.pop()
+			if elem in self.live or elem.id:
+				self.live.pop(elem, None)
+				elem.hide()
+			if isinstance(elem, Volume):
+				stack.extend(elem.elements)
+
+	def forget(self, elem):
+		self.live.pop(elem, None)
+
+	def touch(self, elem):
+		# 元素几何变化：扩展可滚动范围，空闲时检查它是否进出了视口
+		x1, y1, x2, y2 = elem.x, elem.y, elem.x + elem.width, elem.y + elem.height
+		extent = self.extent
+		if extent is None:
+			self.extent = [x1, y1, x2, y2]
+		elif x1 < extent[0] or y1 < extent[1] or x2 > extent[2] or y2 > extent[3]:
+			self.extent = [min(x1, extent[0]), min(y1, extent[1]),
+							max(x2, extent[2]), max(y2, extent[3])]
+		if self.rect is None:
+			return
+		self.touched.add(elem)
+		if self.pending is None:
+			self.pending = self.canvas.after_idle(self.settle)
+
+	def schedule(self):
+		# 滚动、缩放、窗口大小变化后整体刷新一次
+		self.touched.clear()
+		if self.pending is not None:
+			self.canvas.after_cancel(self.pending)
+		self.pending = self.canvas.after_idle(self.refresh)
+
+	def settle(self):
+		self.pending = None
+		touched, self.touched = self.touched, set()
+		created = False
+		for elem in touched:
+			if elem not in self.index:
+				continue	# 已删除
+			level = self.level(elem)
+			if level != self.live.get(elem, DETAIL_HIDDEN):
+				created |= not elem.id and level > DETAIL_HIDDEN
+				elem.draw()
+		self.update_scrollregion()
+		if created:
+			self.restack()
+
+	def refresh(self):
+		if self.pending is not None:
+			self.canvas.after_cancel(self.pending)
+			self.pending = None
+		self.touched.clear()
+		self.rect = self.visible_rect()
+		if self.rect is None:
+			return
+		m = self.margin / self.scale
+		x1, y1, x2, y2 = self.rect
+		wanted = self.index.query_rect(x1 - m, y1 - m, x2 + m, y2 + m)
+		for elem in wanted[:]:
+			wanted.extend(elem.incoming())
+		wanted = set(wanted)
+		for elem in [elem for elem in self.live if elem not in wanted]:
+			self.live.pop(elem, None)
+			elem.hide()
+		created = False
+		for elem in sorted(wanted, key=self.index.paint_order):
+			level = self.level(elem)
+			if level != self.live.get(elem, DETAIL_HIDDEN) or (level and not elem.id):
+				created |= not elem.id and level > DETAIL_HIDDEN
+				elem.draw()
+		self.update_scrollregion()
+		if created:
+			self.restack()
+
+	def restack(self):
+		# 新建的图元都在最上层，按绘制顺序把可见元素重新叠放一遍
+		for elem in sorted(self.live, key=self.index.paint_order):
+			elem.raise_items()
+		self.canvas.tag_raise('arrow')
+
+	def update_scrollregion(self):
+		if self.extent is None or self.rect is None:
+			return
+		x1, y1, x2, y2 = self.extent
+		m = self.margin
+		region = (min(x1 - m, self.rect[0]), min(y1 - m, self.rect[1]),
+				max(x2 + m, self.rect[2]), max(y2 + m, self.rect[3]))
+		if region != self.region or self.scale != self.region_scale:
+			# 可滚动范围按世界坐标计算，交给画布时换算成画布坐标
+			self.region = region
+			self.region_scale = self.scale
+			self.canvas.configure(scrollregion=tuple(v * self.scale for v in region))
+
+
+class ChangeFeed:
+	# 模型变动通知：元素调用 emit，自动保存日志等订阅者依次收到 (op, elem, data)
+	def __init__(self):
+		self.listeners = []
+		self.muted = 0
+
+	def emit(self, op, elem, data):
+		if self.muted:
+			return
+		for listener in self.listeners:
+			listener(op, elem, data)
+
+	@contextmanager
+	def mute(self):
+		self.muted += 1
+		try:
+			yield
+		finally:
+			self.muted -= 1
+
+
+class Selection:
+	# 多选：按选中顺序记录元素，批量移动、删除、复制、打包各算一次操作。
+	# 第一次批量拖动前给选中的顶层对象打上 SELECTION_TAG（之后新建的图元由 group_tags 带上），
+	# 每帧只需一次 canvas.move；单击选择不改写图元标签
+	def __init__(self, board):
+		self.board = board
+		self.members = {}
+		self.tagged = set()
+
+	def __contains__(self, elem):
+		return elem in self.members
+
+	def __iter__(self):
+		return iter(list(self.members))
+
+	def __len__(self):
+		return len(self.members)
+
+	def add(self, elem):
+		if elem not in self.members:
+			self.members[elem] = None
+			elem.set_highlight(True)
+
+	def discard(self, elem):
+		if elem in self.members:
+			del self.members[elem]
+			self.untag(elem)
+			# 实时可达性分析打开时，垃圾对象取消选中后仍保持高亮
+			analysis = self.board.reachability
+			elem.set_highlight(analysis.active and elem in analysis.garbage)
+
+	def toggle(self, elem):
+		if elem in self.members:
+			self.discard(elem)
+		else:
+			self.add(elem)
+
+	def set(self, elements):
+		elements = dict.fromkeys(elements)
+		for elem in [elem for elem in self.members if elem not in elements]:
+			self.discard(elem)
+		for elem in elements:
+			self.add(elem)
+
+	def clear(self):
+		self.set(())
+
+	def prune(self):
+		# 去掉已删除的元素（撤销、清空之后）
+		index = self.board.index
+		for elem in [elem for elem in self.members if elem not in index]:
+			del self.members[elem]
+			self.tagged.discard(elem)
+
+	def roots(self):
+		# 选中的顶层对象：批量移动与打包的对象
+		index = self.board.index
+		return [elem for elem in self.members if elem.parent is None and elem in index]
+
+	def tops(self):
+		# 祖先没有被选中的元素：批量删除与复制时子树只处理一次
+		index = self.board.index
+		found = []
+		for elem in self.members:
+			parent = elem.parent
+			while parent is not None and parent not in self.members:
+				parent = parent.parent
+			if parent is None and elem in index:
+				found.append(elem)
+		return found
+
+	def tag(self, roots):
+		for root in roots:
+			if root not in self.tagged:
+				self.tagged.add(root)
+				root.retag()
+
+	def untag(self, elem):
+		if elem in self.tagged:
+			self.tagged.discard(elem)
+			if elem in self.board.index:
+				elem.retag()
+
+	def move(self, dx, dy):
+		roots = self.roots()
+		if not roots:
+			return
+		self.tag(roots)
+		canvas = self.board.canvas
+		canvas.move(SELECTION_TAG, dx, dy)
+		shift_subtrees(canvas, roots, dx, dy)
+		for root in roots:
+			root.emit('move', dx=dx, dy=dy)
+
+	def delete(self):
+		elements = self.tops()
+		self.clear()
+		index = self.board.index
+		with self.board.batch():
+			for elem in elements:
+				if elem in index:
+					elem.delete()
+
+	def copy_records(self):
+		return self.board.copy_records(self.tops())
+
+	def wrap(self, name="Struct"):
+		# 把选中的顶层对象按从左到右的顺序放进一个新的 StructBlock，第一个位置对齐原来的左上角
+		roots = sorted(self.roots(), key=lambda elem: (elem.x, elem.y))
+		if not roots:
+			return None
+		board = self.board
+		x = min(elem.x for elem in roots)
+		y = min(elem.y for elem in roots)
+		self.clear()
+		with board.batch():
+			struct = board.struct(name, x - 20, y - 40)
+			for elem in roots:
+				struct.add_element(elem)
+				board.elements.remove(elem)
+		self.set([struct])
+		return struct
+
+
 class BaseElement:
+	# 大画板上元素对象数以十万计：用 __slots__ 去掉每个实例的 __dict__，同名字符串共用一份；
+	# uuid 在第一次被读取（保存、写日志）时才生成，标准格式的 uuid 以 128 位整数保存，读取时再格式化
+	__slots__ = ('canvas', 'x', 'y', 'width', 'height', 'name', 'id', 'text_id',
+		'selected', 'parent', '_uuid')
+
 	def __init__(self, canvas, x, y, name="", width=120, height=60):
 		self.canvas = canvas
 		self.x = x
 		self.y = y
 		self.width = width
 		self.height = height
-		self.name = name
+		self.name = sys.intern(name) if type(name) is str else name
 		self.id = None
 		self.text_id = None
 		self.selected = False
 		self.parent = None
-		self.pointers = []
-		self.uuid = str(uuid.uuid4())
+		self._uuid = None
+
+	@property
+	def uuid(self):
+		uid = self._uuid
+		if uid is None:
+			uid = self._uuid = uuid.uuid4().int
+		if type(uid) is int:
+			h = '%032x' % uid
+			return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+		return uid
+
+	@uuid.setter
+	def uuid(self, value):
+		if type(value) is str and _CANONICAL_UUID.fullmatch(value):
+			value = int(value.replace('-', ''), 16)
+		self._uuid = value
 
 	def to_dict(self):
 		return {
@@ -55,18 +798,100 @@ class BaseElement:
 	def draw(self):
 		pass
 
+	def emit(self, op, **data):
+		changes = getattr(self.canvas, 'changes', None)
+		if changes is not None:
+			changes.emit(op, self, data)
+
+	def reindex(self):
+		index = getattr(self.canvas, 'spatial_index', None)
+		if index is not None:
+			index.update(self)
+		viewport = getattr(self.canvas, 'viewport', None)
+		if viewport is not None:
+			viewport.touch(self)
+
+	def detail(self):
+		# 由视口决定画到什么程度；没有视口（无界面、测试）时总是完整绘制
+		viewport = getattr(self.canvas, 'viewport', None)
+		if viewport is None:
+			return DETAIL_FULL
+		return viewport.claim(self)
+
+	def hide(self):
+		# 删除画布图元，几何、索引与模型关系保持不变
+		for item in self.canvas_items():
+			if item:
+				self.canvas.delete(item)
+		self.id = None
+		self.text_id = None
+		viewport = getattr(self.canvas, 'viewport', None)
+		if viewport is not None:
+			viewport.forget(self)
+
 	def move(self, dx, dy):
-		for pointer in self.pointers:
-			pointer.update_arrow()
+		self.shift(dx, dy)
+		if self.parent is None:
+			self.emit('move', dx=dx, dy=dy)
+
+	def shift(self, dx, dy):
+		# 只平移元素自身的图元，子元素由 Volume.move 负责
+		self.update_arrows()
 		
 		self.x += dx
 		self.y += dy
-		self.canvas.move(self.id, dx, dy)
-		self.canvas.move(self.text_id, dx, dy)
+		if self.id:
+			self.canvas.move(self.id, dx, dy)
+		if self.text_id:
+			self.canvas.move(self.text_id, dx, dy)
+		self.reindex()
+
+	def canvas_items(self):
+		return [self.id, self.text_id]
+
+	def group_tags(self):
+		# 图元带上祖先容器的分组标签（最近的 GROUP_DEPTH 层），子树可以用一次 canvas.move 平移
+		return self.tag_chain([])
+
+	def tag_chain(self, tags):
+		# 带得到顶层对象分组标签的图元，在顶层对象被多选拖动时再带上选择标签
+		top = self
+		parent = self.parent
+		while parent is not None and len(tags) < GROUP_DEPTH:
+			tags.append(parent.group_tag)
+			top = parent
+			parent = parent.parent
+		if parent is None:
+			selection = getattr(self.canvas, 'selection', None)
+			if selection is not None and top in selection.tagged:
+				tags.append(SELECTION_TAG)
+		return tuple(tags)
+
+	def own_items(self):
+		return [item for item in self.canvas_items() if item]
+
+	def retag_items(self):
+		tags = self.group_tags()
+		for item in self.canvas_items():
+			if item:
+				self.canvas.itemconfigure(item, tags=tags)
+
+	def retag(self):
+		# 加入或离开容器后按新位置重设图元的分组标签；按 id 逐个设置，不做按标签的全画布查找
+		self.retag_items()
+
+	def lift(self):
+		self.raise_items()
+
+	def raise_items(self):
+		for item in self.canvas_items():
+			if item:
+				self.canvas.tag_raise(item)
 
 	def set_highlight(self, state):
 		self.selected = state
-		self.canvas.itemconfig(self.id, outline=COLORS['highlight'] if state else 'black')
+		if self.id:
+			self.canvas.itemconfig(self.id, outline=COLORS['highlight'] if state else 'black')
 
 	def show_context_menu(self, event):
 		menu = Menu(self.canvas, tearoff=0)
@@ -78,71 +903,134 @@ class BaseElement:
 		menu.post(event.x_root, event.y_root)
 
 	def move_out(self):
-		self.canvas.lift(self.id)
-		self.canvas.lift(self.text_id)
+		old_x, old_y = self.x, self.y
 		if self.parent:
-			self.parent.remove_element(self)
-			self.x = self.parent.x + self.parent.width + 20
-			self.y = self.parent.y
-			self.parent = None
-		print(self.name)
+			parent = self.parent
+			parent.remove_element(self)
+			# 容器布局是延迟的：先按移除后的大小重新测量，再放到新的右边缘外
+			layout = getattr(self.canvas, 'layout', None)
+			if layout is not None:
+				layout.flush()
+			self.x = parent.x + parent.width + 20
+			self.y = parent.y
 		self.draw()
+		self.lift()
+		self.update_arrows()
+		board = getattr(self.canvas, 'board', None)
+		if board is not None and self not in board.elements:
+			board.elements.append(self)
+		self.emit('move', dx=self.x - old_x, dy=self.y - old_y)
 
 
 	def rename(self):
 		new_name = simpledialog.askstring("Rename", "Enter new name:", initialvalue=self.name)
 		if new_name:
-			self.name = new_name
-			self.update_text()
+			self.relabel(new_name)
+
+	def relabel(self, name, value=None):
+		old_name = self.name
+		old_value = getattr(self, 'value', None)
+		self.name = name
+		if value is not None:
+			self.value = value
+		self.update_text()
+		self.emit('rename', old_name=old_name, old_value=old_value)
 
 	def copy(self):
-		new_obj = self.__class__(self.canvas, self.x+20, self.y+20)
-		new_obj.name = self.name
-		new_obj.width = self.width
-		new_obj.height = self.height
-		if isinstance(self, DataCell):
-			new_obj.value = self.value
-		new_obj.draw()
-		#self.elements.append(StackQueue(self.canvas, 700, 100, "Queue", False))
-		global app
-		app.elements.append(new_obj)
-		return new_obj
+		# 在右下方复制一份（连同整棵子树），副本是顶层元素
+		return self.canvas.board.clone([self])[0]
 		
 	def delete(self):
+		self.emit('delete')
 		try:
 			self.on_delete()
 		except:
 			pass 
 			
-		for pointer in self.pointers.copy():
-			if pointer.arrow:
-				self.canvas.delete(pointer.arrow)
-				pointer.arrow = None
+		# 指向自己的指针一并置空，反向索引里不留已删除的元素
+		for pointer in list(self.incoming()):
+			pointer.clear_arrow()
 		
-		self.canvas.delete(self.id)
-		self.canvas.delete(self.text_id)
+		self.hide()
+		index = getattr(self.canvas, 'spatial_index', None)
+		if index is not None:
+			index.remove(self)
+		layout = getattr(self.canvas, 'layout', None)
+		if layout is not None:
+			layout.discard(self)
 		
 		if self.parent and hasattr(self.parent, 'remove_element'):
 			try:
 				self.parent.remove_element(self)
 			except:
 				pass
+		else:
+			board = getattr(self.canvas, 'board', None)
+			if board is not None and self in board.elements:
+				board.elements.remove(self)
 
 	def update_text(self):
-		self.canvas.itemconfig(self.text_id, text=self.name)
+		if self.text_id:
+			self.canvas.itemconfig(self.text_id, text=self.name)
+
+	def incoming(self):
+		edges = getattr(self.canvas, 'edges', None)
+		return edges.pointers_to(self) if edges is not None else ()
 
 	def update_arrows(self):
-		for pointer in self.pointers:
-			pointer.update_arrow()
+		for pointer in self.incoming():
+			pointer.schedule_arrow()
+
 
 
+def shift_subtrees(canvas, roots, dx, dy):
+	# 图元已按标签整体平移后，更新子树的模型坐标；比 GROUP_DEPTH 更深的成员不带根的标签，单独平移。
+	# 子树内部的箭头跟着平移即可，只有跨越子树边界的箭头需要重新计算
+	members = []
+	stack = [(root, 0) for root in roots]
+	while stack:
+		elem, depth = stack.pop()
+		elem.x += dx
+		elem.y += dy
+		elem.reindex()
+		members.append(elem)
+		if isinstance(elem, Volume):
+			depth += 1
+			stack.extend((child, depth) for child in elem.elements)
+		if depth > GROUP_DEPTH:
+			for item in elem.own_items():
+				canvas.move(item, dx, dy)
+	inside = set(members)
+	for elem in members:
+		for pointer in elem.incoming():
+			if pointer not in inside:
+				pointer.schedule_arrow()
+		target = getattr(elem, 'target', None)
+		if target is not None and target not in inside:
+			elem.schedule_arrow()
 
 
 class Volume(BaseElement):
-	
-	def to_dict(self):
+	__slots__ = ('elements',)
+
+	def to_dict(self, children=True):
 		data = super().to_dict()
-		data["elements"] = [child.to_dict() for child in self.elements]
+		if children:
+			# 用显式栈逐层填入 elements，嵌套再深也不递归；is_stack 等键仍排在 elements 之后
+			stack = [(self, data)]
+			while stack:
+				volume, out = stack.pop()
+				out["elements"] = kids = []
+				for child in volume.elements:
+					if isinstance(child, Volume):
+						child_data = child.to_dict(children=False)
+						stack.append((child, child_data))
+					else:
+						child_data = child.to_dict()
+					kids.append(child_data)
+				for key in _TRAILING_KEYS:
+					if key in out:
+						out[key] = out.pop(key)
 		return data
 
 	@classmethod
@@ -156,98 +1044,163 @@ class Volume(BaseElement):
 		self.elements = []
 		#self.children = []
 
-	def copy(self):
-		new_obj = self.__class__(self.canvas, self.x+20, self.y+20)
-		new_obj.name = self.name
-		new_obj.width = self.width
-		new_obj.height = self.height
-		if isinstance(self, DataCell):
-			new_obj.value = self.value
-		
-		for ele in self.elements:
-			
-			new_obj.add_element(ele.copy())
-			#self.elements.remove(self.selected_element)
-		#new_obj.children=self.children
-		'''
-				if target_struct:
-			target_struct.add_element(self.selected_element)
-			if self.selected_element in self.elements:
-				
-				
-		
-		'''
-		new_obj.draw()
-		global app
-		app.elements.append(new_obj)
-		return new_obj
+	@property
+	def group_tag(self):
+		return f"group{id(self):x}"
+
+	def group_tags(self):
+		return self.tag_chain([self.group_tag])
+
+	def draw_later(self):
+		# 批量操作中新建的容器先不画：子元素加进来后尺寸还会变，交给布局在结束时统一画一次
+		layout = getattr(self.canvas, 'layout', None)
+		if layout is not None and layout.depth:
+			layout.mark(self)
+		else:
+			self.draw()
 
+	def retag(self):
+		stack = [self]
+		while stack:
+			elem = stack.pop()
+			elem.retag_items()
+			if isinstance(elem, Volume):
+				stack.extend(elem.elements)
 
-	def add_element(self, element):
+	def add_element(self, element, index=None):
 
 		if element.parent != None:
 			return
 			
 		element.parent = self
-		self.elements.append(element)
+		element.retag()
+		if index is None:
+			index = len(self.elements)
+		self.elements.insert(index, element)
+		element.emit('add', parent=self, index=index)
+		self._raise_in_index(element)
 		self.update_size()
+		# 批量里还没画出的容器会在结束时由 LayoutEngine.restack 连同子元素整体重新叠放，这里不必逐个提层
+		layout = getattr(self.canvas, 'layout', None)
+		if not self.id and layout is not None and layout.depth:
+			return
+		element.lift()
+		router = getattr(self.canvas, 'arrow_router', None)
+		if router is not None:
+			router.raise_arrows()
+
+	def _raise_in_index(self, element):
+		index = getattr(self.canvas, 'spatial_index', None)
+		if index is not None:
+			index.raise_(element)
 
 	def remove_element(self, element):
 		if element in self.elements:
-			self.elements.remove(element)
+			index = self.elements.index(element)
+			del self.elements[index]
 			element.parent = None
+			element.retag()
+			self._raise_in_index(element)
 			self.update_size()
-			self.canvas.lift(element.id)
-			self.canvas.lift(element.text_id)
-			try:
-				self.canvas.lift(element.dot)
-			except:
-				pass
+			element.lift()
+			element.emit('remove', parent=self, index=index)
 
 	def update_size(self):
-		self.rearrange_elements()
-		self.draw()
+		layout = getattr(self.canvas, 'layout', None)
+		if layout is not None:
+			layout.mark(self)
+		else:
+			self.draw()
+
+	def measure(self):
+		pass
 
 	def delete(self):
-		for elem in self.elements.copy():
-			elem.delete()
-		super().delete()
+		# 子元素先于容器删除；用显式栈做后序遍历，嵌套超过递归上限的画板也能清空
+		stack = [(self, False)]
+		while stack:
+			elem, done = stack.pop()
+			if not isinstance(elem, Volume):
+				elem.delete()
+			elif done:
+				BaseElement.delete(elem)
+			else:
+				stack.append((elem, True))
+				stack.extend((child, False) for child in reversed(elem.elements))
 
 	def move(self, dx, dy):
-		super().move(dx, dy)
-		for elem in self.elements:
-			elem.move(dx, dy)
+		# 整棵子树的图元共用分组标签，一次 canvas.move 全部平移；模型坐标用显式栈逐个更新
+		self.canvas.move(self.group_tag, dx, dy)
+		shift_subtrees(self.canvas, [self], dx, dy)
+		if self.parent is None:
+			self.emit('move', dx=dx, dy=dy)
+
+	def lift(self):
+		stack = [self]
+		while stack:
+			elem = stack.pop()
+			elem.raise_items()
+			if isinstance(elem, Volume):
+				stack.extend(reversed(elem.elements))
 
 	def rearrange_elements(self):
 		pass
+
+	def place(self, elem, x, y):
+		# 把子元素放到 (x, y)：已有图元只需平移；被视口裁掉的元素位置没变时也不必重画
+		if elem.x == x and elem.y == y and (elem.id or not elem.detail()):
+			return
+		layout = getattr(self.canvas, 'layout', None)
+		arranging = layout is not None and elem in layout.arranging
+		if not elem.id:
+			elem.x = x
+			elem.y = y
+			if not arranging:
+				# 本轮布局里的容器会按由外到内的顺序逐个画，这里不递归
+				elem.draw()
+			elem.update_arrows()
+			return
+		if arranging:
+			# 本轮布局稍后会重新排布它的子元素，这里只平移容器自身
+			elem.shift(x - elem.x, y - elem.y)
+		else:
+			elem.move(x - elem.x, y - elem.y)
 	# 其他现有方法保持不变...
 
 
 
 
 class DataCell(BaseElement):
+	__slots__ = ('value',)
+
 	def __init__(self, canvas, x, y, name="Data", value=""):
 		super().__init__(canvas, x, y, name)
 		self.value = value
 		self.draw()
 
 	def draw(self):
+		# 画布图元只创建一次，之后原地更新，保持 id、标签和层级不变
+		if not self.detail():
+			self.reindex()
+			return
 		if self.id:
-			self.canvas.delete(self.id)
-			self.canvas.delete(self.text_id)
-		
-		self.id = self.canvas.create_rectangle(
-			self.x, self.y, self.x+120, self.y+60,
-			fill=COLORS['data_cell'], outline='black', width=2)
-		self.text_id = self.canvas.create_text(
-			self.x+10, self.y+10, anchor=tk.NW,
-			text=f"{self.name}\nValue: {self.value}", font=('Arial', 10))
+			self.canvas.coords(self.id, self.x, self.y, self.x+120, self.y+60)
+			self.canvas.coords(self.text_id, self.x+10, self.y+10)
+			self.update_text()
+		else:
+			self.id = self.canvas.create_rectangle(
+				self.x, self.y, self.x+120, self.y+60,
+				fill=COLORS['data_cell'], outline=COLORS['highlight'] if self.selected else 'black', width=2,
+				tags=self.group_tags())
+			self.text_id = self.canvas.create_text(
+				self.x+10, self.y+10, anchor='nw',
+				text=f"{self.name}\nValue: {self.value}", font=('Arial', 10), tags=self.group_tags())
+		self.reindex()
 
 	def edit_value(self):
 		new_value = simpledialog.askstring("Edit Value", "Enter new value:", initialvalue=self.value)
 		if new_value is not None:
-			self.value = new_value
-			self.update_text()
+			self.relabel(self.name, new_value)
 
 	def show_context_menu(self, event):
 		menu = Menu(self.canvas, tearoff=0)
@@ -274,19 +1227,18 @@ class DataCell(BaseElement):
 		value_entry.focus_set()
 		
 		def apply():
-			self.name = name_entry.get()
-			self.value = value_entry.get()
-			self.update_text()
+			self.relabel(name_entry.get(), value_entry.get())
 			dialog.destroy()
 		
 		tk.Button(dialog, text="OK", command=apply).grid(row=2, column=1, pady=5)
 		
-		dialog.transient(self.canvas.master)
+		dialog.transient(self.canvas.winfo_toplevel())
 		dialog.grab_set()
-		self.canvas.master.wait_window(dialog)
+		self.canvas.wait_window(dialog)
 
 	def update_text(self):
-		self.canvas.itemconfig(self.text_id, text=f"{self.name}\nValue: {self.value}")
+		if self.text_id:
+			self.canvas.itemconfig(self.text_id, text=f"{self.name}\nValue: {self.value}")
 
 	
 	def to_dict(self):
@@ -296,94 +1248,133 @@ class DataCell(BaseElement):
 
 	@classmethod
 	def from_dict(cls, data, canvas):
-		cell = cls(canvas, data['x'], data['y'], data['name'])
+		cell = cls(canvas, data['x'], data['y'], data['name'], data.get('value', ''))
 		cell.uuid = data['uuid']
-		cell.value = data['value']
 		return cell
 
 	# 其他现有方法保持不变...
 
 class PointerCell(BaseElement):
+	__slots__ = ('target', 'arrow', 'dot')
+
 	def __init__(self, canvas, x, y, name="Pointer"):
 		super().__init__(canvas, x, y, name)
 		self.target = None
 		self.arrow = None
+		self.dot = None
 		self.draw()
 
 	def on_delete(self):
-		self.canvas.delete(self.dot)
+		self.clear_arrow()
+		router = getattr(self.canvas, 'arrow_router', None)
+		if router is not None:
+			router.discard(self)
+
+	def hide(self):
+		super().hide()
+		self.dot = None
+		if self.arrow:
+			self.canvas.delete(self.arrow)
+			self.arrow = None
 		
 	def draw(self):
+		if not self.detail():
+			self.reindex()
+			return
 		if self.id:
-			self.canvas.delete(self.id)
-			self.canvas.delete(self.text_id)
-			self.canvas.delete(self.dot)
-		
-		self.id = self.canvas.create_rectangle(
-			self.x, self.y, self.x+120, self.y+60,
-			fill=COLORS['pointer_cell'], outline='black', width=2)
-		self.dot = self.canvas.create_oval(
-			self.x+60-5, self.y+30-5,
-			self.x+60+5, self.y+30+5,
-			fill='red', outline='black')
-		self.text_id = self.canvas.create_text(
-			self.x+10, self.y+10, anchor=tk.NW,
-			text=self.name, font=('Arial', 10))
+			self.canvas.coords(self.id, self.x, self.y, self.x+120, self.y+60)
+			self.canvas.coords(self.dot,
+				self.x+60-5, self.y+30-5,
+				self.x+60+5, self.y+30+5)
+			self.canvas.coords(self.text_id, self.x+10, self.y+10)
+			self.update_text()
+		else:
+			self.id = self.canvas.create_rectangle(
+				self.x, self.y, self.x+120, self.y+60,
+				fill=COLORS['pointer_cell'], outline=COLORS['highlight'] if self.selected else 'black', width=2,
+				tags=self.group_tags())
+			self.dot = self.canvas.create_oval(
+				self.x+60-5, self.y+30-5,
+				self.x+60+5, self.y+30+5,
+				fill='red', outline='black', tags=self.group_tags())
+			self.text_id = self.canvas.create_text(
+				self.x+10, self.y+10, anchor='nw',
+				text=self.name, font=('Arial', 10), tags=self.group_tags())
+		self.reindex()
+
+	def canvas_items(self):
+		return [self.id, self.dot, self.text_id]
+
+	def own_items(self):
+		items = super().own_items()
+		if self.arrow:
+			items.append(self.arrow)
+		return items
+
+	def retag_items(self):
+		super().retag_items()
+		if self.arrow:
+			self.canvas.itemconfigure(self.arrow, tags=('arrow',) + self.group_tags())
 
 	def create_arrow(self, target):
-		if self.target:
-			self.target.pointers.remove(self)
-		self.target = target
-		target.pointers.append(self)
-		self.update_arrow()
+		if target is not self.target:
+			old = self.target
+			self.link(target)
+			self.emit('arrow', old=old)
+		self.schedule_arrow()
 
-	def update_arrow(self):
+	def link(self, target):
+		edges = getattr(self.canvas, 'edges', None)
+		if edges is not None:
+			edges.link(self, target)
+		else:
+			self.target = target
+
+	def clear_arrow(self):
 		if self.arrow:
 			self.canvas.delete(self.arrow)
+			self.arrow = None
+		if self.target:
+			old = self.target
+			self.link(None)
+			self.emit('arrow', old=old)
+
+	def schedule_arrow(self):
+		router = getattr(self.canvas, 'arrow_router', None)
+		if router is not None:
+			router.mark(self)
+		else:
+			self.update_arrow()
+
+	def update_arrow(self):
 		if not self.target:
+			if self.arrow:
+				self.canvas.delete(self.arrow)
+				self.arrow = None
 			return
 	
+		target = self.target
+		end_x, end_y = clip_arrow(self.x + 60, self.y + 30,
+			target.x, target.y, target.width, target.height)
+		self.set_arrow(end_x, end_y)
+
+	def set_arrow(self, end_x, end_y):
+		if not self.id:
+			return	# 指针在视口外没有图元，箭头也不画
 		start_x = self.x + 60
 		start_y = self.y + 30
-		
-		
-		
-		
-		target_center_x = self.target.x + self.target.width/2
-		target_center_y = self.target.y + self.target.height/2
-	
-		dx = target_center_x - start_x
-		dy = target_center_y - start_y
-		
-		if  self.target.contains(start_x,start_y):
-			if abs(dx) > abs(dy):
-				edge_x = self.target.x if dx > 0 else self.target.x + self.target.width
-				end_x = edge_x
-				ratio = (edge_x - start_x) / dx if dx != 0 else 0
-				end_y = start_y + dy * ratio
-			else:
-				edge_y = self.target.y if dy > 0 else self.target.y + self.target.height
-				end_y = edge_y
-				ratio = (edge_y - start_y) / dy if dy != 0 else 0
-				end_x = start_x + dx * ratio
+		if self.arrow:
+			self.canvas.coords(self.arrow, start_x, start_y, end_x, end_y)
 		else:
-			end_x=target_center_x
-			end_y=target_center_y
-			ratio=1.0
-			while( self.target.contains(end_x,end_y) and ratio>0 ):
-				ratio=ratio-0.02
-				end_y = start_y + dy * ratio
-				end_x = start_x + dx * ratio
-		
-		
-		self.arrow = self.canvas.create_line(
-			start_x, start_y, end_x, end_y,
-			arrow=tk.LAST, fill=COLORS['arrow'], width=2)
+			self.arrow = self.canvas.create_line(
+				start_x, start_y, end_x, end_y,
+				arrow='last', fill=COLORS['arrow'], width=2, tags=('arrow',) + self.group_tags())
 
-	def move(self, dx, dy):
-		super().move(dx, dy)
-		self.canvas.move(self.dot, dx, dy)
-		self.update_arrow()
+	def shift(self, dx, dy):
+		super().shift(dx, dy)
+		if self.dot:
+			self.canvas.move(self.dot, dx, dy)
+		self.schedule_arrow()
 		
 	def to_dict(self):
 		data = super().to_dict()
@@ -399,32 +1390,48 @@ class PointerCell(BaseElement):
 
 
 class StructBlock(Volume):
+	__slots__ = ()
+
 	def __init__(self, canvas, x, y, name="Struct"):
 		super().__init__(canvas, x, y, name, 230, 120)
-		self.draw()
+		self.draw_later()
 
-	def draw(self):
+	def measure(self):
 		self.width = max(200, 120 * len(self.elements) + 80)
-		if self.id:
-			self.canvas.delete(self.id)
+
+	def draw(self):
+		self.measure()
+		detail = self.detail()
+		if detail:
+			if self.id:
+				self.canvas.coords(self.id, self.x, self.y, self.x+self.width, self.y+120)
+			else:
+				self.id = self.canvas.create_rectangle(
+					self.x, self.y, self.x+self.width, self.y+120,
+					fill=COLORS['struct_block'], outline=COLORS['highlight'] if self.selected else 'black', width=2,
+					tags=self.group_tags())
+		if detail == DETAIL_FULL:
+			if self.text_id:
+				self.canvas.coords(self.text_id, self.x+10, self.y+10)
+				self.update_text()
+			else:
+				self.text_id = self.canvas.create_text(
+					self.x+10, self.y+10, anchor='nw',
+					text=self.name, font=('Arial', 12), tags=self.group_tags())
+		elif self.text_id:
 			self.canvas.delete(self.text_id)
-		
-		self.id = self.canvas.create_rectangle(
-			self.x, self.y, self.x+self.width, self.y+120,
-			fill=COLORS['struct_block'], outline='black', width=2)
-		self.text_id = self.canvas.create_text(
-			self.x+10, self.y+10, anchor=tk.NW,
-			text=self.name, font=('Arial', 12))
+			self.text_id = None
+		self.reindex()
 		self.rearrange_elements()
 
+	def slot(self, i, width=120):
+		# 第 i 个子元素的位置
+		return self.x + 20 + i * (width + 10), self.y + 40
+
 	def rearrange_elements(self):
-		x_offset = 20
-		y_offset = 40
 		for i, elem in enumerate(self.elements):
-			elem.x = self.x + x_offset + i * (elem.width + 10)
-			elem.y = self.y + y_offset
-			elem.draw()
-			elem.update_arrows()
+			new_x, new_y = self.slot(i, elem.width)
+			self.place(elem, new_x, new_y)
 	
 	@classmethod
 	def from_dict(cls, data, canvas):
@@ -436,44 +1443,72 @@ class StructBlock(Volume):
 
 
 class StackQueue(Volume):
+	__slots__ = ('is_stack',)
+
 	def __init__(self, canvas, x, y, name="Stack", is_stack=True):
 		super().__init__(canvas, x, y, name, 150, 100)
 		self.is_stack = is_stack
-		self.draw()
+		self.draw_later()
 
-	def draw(self):
+	def measure(self):
 		self.height = max(100, 90 + len(self.elements) * 65)
-		if self.id:
-			self.canvas.delete(self.id)
+
+	def draw(self):
+		self.measure()
+		detail = self.detail()
+		if detail:
+			if self.id:
+				self.canvas.coords(self.id, self.x, self.y, self.x+150, self.y+self.height)
+			else:
+				self.id = self.canvas.create_rectangle(
+					self.x, self.y, self.x+150, self.y+self.height,
+					fill=COLORS['stack_queue'], outline=COLORS['highlight'] if self.selected else 'black', width=2,
+					tags=self.group_tags())
+		if detail == DETAIL_FULL:
+			if self.text_id:
+				self.canvas.coords(self.text_id, self.x+10, self.y+10)
+				self.update_text()
+			else:
+				self.text_id = self.canvas.create_text(
+					self.x+10, self.y+10, anchor='nw',
+					text=f"{self.name}\nElements: {len(self.elements)}", font=('Arial', 12),
+					tags=self.group_tags())
+		elif self.text_id:
 			self.canvas.delete(self.text_id)
-		
-		self.id = self.canvas.create_rectangle(
-			self.x, self.y, self.x+150, self.y+self.height,
-			fill=COLORS['stack_queue'], outline='black', width=2)
-		self.text_id = self.canvas.create_text(
-			self.x+10, self.y+10, anchor=tk.NW,
-			text=f"{self.name}\nElements: {len(self.elements)}", font=('Arial', 12))
+			self.text_id = None
+		self.reindex()
 		self.rearrange_elements()
 
+	def update_text(self):
+		if self.text_id:
+			self.canvas.itemconfig(self.text_id, text=f"{self.name}\nElements: {len(self.elements)}")
+
 	def rearrange_elements(self):
 		y_offset = 80
 		le = len(self.elements)
 		for i, elem in enumerate(self.elements):
-			elem.x = self.x + (150 - elem.width)/2
-			elem.y = self.y + y_offset + (le-i-1 if self.is_stack else i) * (elem.height + 5)
-			elem.draw()
-			elem.update_arrows()
+			new_x = self.x + (150 - elem.width)/2
+			new_y = self.y + y_offset + (le-i-1 if self.is_stack else i) * (elem.height + 5)
+			self.place(elem, new_x, new_y)
 
-	def remove_element(self):
+	def remove_element(self, element=None):
+		# 不指定元素时按栈/队列规则弹出一个
+		if element is not None:
+			super().remove_element(element)
+			return element
 		if not self.elements:
 			return None
-		elem = self.elements.pop() if self.is_stack else self.elements.pop(0)
+		index = len(self.elements) - 1 if self.is_stack else 0
+		elem = self.elements.pop(index)
 		elem.parent = None
+		elem.retag()
+		self._raise_in_index(elem)
 		self.update_size()
+		elem.emit('remove', parent=self, index=index)
 		return elem
 	
-	def to_dict(self):
-		data = super().to_dict()
+	def to_dict(self, children=True):
+		data = super().to_dict(children)
 		data["is_stack"] = self.is_stack
 		return data
 
@@ -491,78 +1526,3092 @@ class StackQueue(Volume):
 
 
 
-class DataStructureCanvas:
+ELEMENT_CLASSES = {
+	'DataCell': DataCell,
+	'PointerCell': PointerCell,
+	'StructBlock': StructBlock,
+	'StackQueue': StackQueue,
+	'Volume': Volume,
+}
 
-	def __init__(self, root):
-		self.root = root
-		self.root.title("Data Structure Whiteboard")
-		self.root.geometry("1200x800")
-		
-		self.canvas = tk.Canvas(root, bg=COLORS['background'])
-		self.canvas.pack(fill=tk.BOTH, expand=True)
-		
-		self.elements = []
-		self.selected_element = None
-		self.drag_start = None
+
+class BoardFormatError(ValueError):
+	pass
+
+
+class _ProgressReader:
+	# 包装二进制文件，按读取的字节数回调进度（0~1）
+	def __init__(self, f, total, progress):
+		self.f = f
+		self.total = max(total, 1)
+		self.progress = progress
+		self.done = 0
+		self.reported = -1
+
+	def read(self, size=-1):
+		data = self.f.read(size)
+		self.done += len(data)
+		if self.progress:
+			percent = self.done * 100 // self.total
+			if percent != self.reported:
+				self.reported = percent
+				self.progress(self.done / self.total)
+		return data
+
+
+_JSON_TOKEN = re.compile(r"""[ \t\n\r,]*(?:
+	(?P<key>"[^"\\]*(?:\\.[^"\\]*)*")[ \t\n\r]*:
+	|(?P<string>"[^"\\]*(?:\\.[^"\\]*)*")(?=[ \t\n\r]*[^ \t\n\r:])
+	|(?P<open>[{\[])
+	|(?P<close>[}\]])
+	|(?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)
+	|(?P<literal>true|false|null)
+	)""", re.VERBOSE)
+_JSON_EVENTS = {
+	'{': ('start_map', None), '[': ('start_array', None),
+	'}': ('end_map', None), ']': ('end_array', None),
+	'true': ('boolean', True), 'false': ('boolean', False), 'null': ('null', None),
+}
+
+
+def iter_json_events(f, chunk_size=1 << 16):
+	# 增量 JSON 解析，产生与 ijson.basic_parse 相同的事件流；f 为二进制文件。
+	# 逗号与冒号不单独成记号，结构是否合法由调用方按事件顺序检查
+	if ijson is not None:
+		for event, value in ijson.basic_parse(f, use_float=True):
+			yield event, value
+		return
+	decoder = codecs.getincrementaldecoder('utf-8')()
+	match = _JSON_TOKEN.match
+	buf = ''
+	pos = 0
+	eof = False
+	while True:
+		m = match(buf, pos)
+		if m is None or (not eof and len(buf) - m.end() < 64):
+			# 记号可能被块边界截断，读入更多数据后重试
+			if eof:
+				if buf[pos:].strip(' \t\n\r,'):
+					raise BoardFormatError(f"invalid JSON near: {buf[pos:pos+40]!r}")
+				return
+			chunk = f.read(chunk_size)
+			eof = not chunk
+			buf = buf[pos:] + decoder.decode(chunk, final=eof)
+			pos = 0
+			continue
+		pos = m.end()
+		kind = m.lastgroup
+		token = m.group(kind)
+		if kind == 'key':
+			yield 'map_key', json.loads(token) if '\\' in token else token[1:-1]
+		elif kind == 'string':
+			yield 'string', json.loads(token) if '\\' in token else token[1:-1]
+		elif kind == 'number':
+			yield 'number', float(token) if '.' in token or 'e' in token or 'E' in token else int(token)
+		else:
+			yield _JSON_EVENTS[token]
+
+
+def _check_record(rec, where):
+	# 校验单个元素记录的结构与字段类型
+	def fail(msg):
+		raise BoardFormatError(f"{where}: {msg}")
+	def number(value):
+		return isinstance(value, (int, float)) and not isinstance(value, bool)
+	if rec.get('type') not in ELEMENT_CLASSES:
+		fail(f"unknown element type {rec.get('type')!r}")
+	if not isinstance(rec.get('uuid'), str):
+		fail("missing uuid")
+	for key in ('x', 'y'):
+		if not number(rec.get(key)):
+			fail(f"'{key}' must be a number")
+	for key in ('width', 'height'):
+		if key in rec and not number(rec[key]):
+			fail(f"'{key}' must be a number")
+	rec.setdefault('width', 120)
+	rec.setdefault('height', 60)
+	if not isinstance(rec.get('name', ''), str):
+		fail("'name' must be a string")
+	rec.setdefault('name', '')
+	if not isinstance(rec.get('value', ''), (str, int, float)):
+		fail("'value' must be a scalar")
+	if not isinstance(rec.get('target_uuid'), (str, type(None))):
+		fail("'target_uuid' must be a string or null")
+	if not isinstance(rec.get('is_stack', True), bool):
+		fail("'is_stack' must be a boolean")
+
+
+def read_board_records(f, progress=None):
+	# 流式读取画板文件，用显式栈（不递归）构建轻量模型：
+	# 返回先序排列的元素记录列表（不含 elements 字段）和每条记录的父记录下标
+	if progress is not None:
+		f.seek(0, os.SEEK_END)
+		total = f.tell()
+		f.seek(0)
+		f = _ProgressReader(f, total, progress)
+	records = []
+	parents = []
+	stack = []
+	key = None
+	for event, value in iter_json_events(f):
+		top = stack[-1] if stack else None
+		if top is None:
+			if event != 'start_array':
+				raise BoardFormatError("board file must contain a JSON array of elements")
+			stack.append(('list', None))
+		elif top[0] == 'skip':
+			if event in ('start_map', 'start_array'):
+				stack.append(('skip', None))
+			elif event in ('end_map', 'end_array'):
+				stack.pop()
+		elif top[0] == 'list':
+			if event == 'start_map':
+				stack.append(('map', len(records)))
+				records.append({})
+				parents.append(top[1])
+			elif event == 'end_array':
+				stack.pop()
+			else:
+				raise BoardFormatError(f"element #{len(records)}: expected an object, got {event}")
+		else:
+			rec = records[top[1]]
+			if event == 'map_key':
+				key = value
+			elif event == 'end_map':
+				stack.pop()
+				_check_record(rec, f"element #{top[1]} ({rec.get('uuid', '?')})")
+			elif event == 'start_array' and key == 'elements':
+				stack.append(('list', top[1]))
+			elif event in ('start_map', 'start_array'):
+				stack.append(('skip', None))
+			else:
+				rec[key] = value
+	if stack:
+		raise BoardFormatError("unexpected end of board file")
+	return records, parents
+
+
+def resolve_board_records(records, parents):
+	# 一遍处理重复 uuid 与指针目标：
+	# 旧版本保存的文件会把容器内的子元素在顶层再写一遍，重复时保留嵌套的那份
+	owner = {}
+	dropped = [False] * len(records)
+	for i, rec in enumerate(records):
+		if parents[i] is not None and dropped[parents[i]]:
+			dropped[i] = True
+			continue
+		prev = owner.get(rec['uuid'])
+		if prev is not None:
+			if parents[prev] is not None and parents[i] is None:
+				dropped[i] = True
+				continue
+			dropped[prev] = True
+		owner[rec['uuid']] = i
+	# 被丢弃元素的子孙也一并丢弃（父记录总在子记录之前）
+	for i in range(len(records)):
+		if parents[i] is not None and dropped[parents[i]]:
+			dropped[i] = True
+	keep = [i for i in range(len(records)) if not dropped[i]]
+	targets = {}
+	for i in keep:
+		target_uuid = records[i].get('target_uuid')
+		if target_uuid and target_uuid in owner and not dropped[owner[target_uuid]]:
+			targets[i] = owner[target_uuid]
+	return keep, targets
+
+
+def board_records(elements, nodes=None):
+	# 把画板上的元素按先序展开成扁平记录（不含 elements 字段）和父记录下标；
+	# 传入 nodes 列表时按同样顺序收集元素本身
+	records = []
+	parents = []
+	stack = [(elem, None) for elem in reversed(elements)]
+	while stack:
+		elem, parent = stack.pop()
+		index = len(records)
+		records.append(elem.to_dict(children=False) if isinstance(elem, Volume) else elem.to_dict())
+		parents.append(parent)
+		if nodes is not None:
+			nodes.append(elem)
+		if isinstance(elem, Volume):
+			stack.extend((child, index) for child in reversed(elem.elements))
+	return records, parents
+
+
+def _json_scalar(value):
+	if isinstance(value, str):
+		return _encode_json_string(value)
+	if value is None:
+		return 'null'
+	if value is True:
+		return 'true'
+	if value is False:
+		return 'false'
+	if type(value) is int:
+		return int.__repr__(value)
+	if type(value) is float and value == value and value not in (float('inf'), float('-inf')):
+		return float.__repr__(value)
+	return json.dumps(value)
+
+
+_encode_json_string = json.encoder.encode_basestring_ascii
+_TRAILING_KEYS = ('is_stack',)
+
+
+def write_board_json(f, records, parents, indent=2, buffer_size=1 << 16):
+	# 单遍、非递归地把扁平记录流式写成 JSON。indent=2 时与原来的
+	# json.dump(..., indent=2) 输出逐字节一致；indent=None 为不换行的紧凑格式
+	if indent is None:
+		pads = None
+		key_sep = ':'
+	else:
+		pads = {}
+		key_sep = ': '
+	def pad(level):
+		if pads is None:
+			return ''
+		text = pads.get(level)
+		if text is None:
+			text = pads[level] = '\n' + ' ' * (indent * level)
+		return text
+	out = []
+	size = 0
+	def write(text):
+		nonlocal size
+		out.append(text)
+		size += len(text)
+		if size >= buffer_size:
+			f.write(''.join(out))
+			out.clear()
+			size = 0
+
+	open_volumes = []
+	list_first = [True]
+	def close_volume():
+		index, level = open_volumes.pop()
+		if list_first.pop():
+			write(']')
+		else:
+			write(pad(level + 1) + ']')
+		rec = records[index]
+		for key in _TRAILING_KEYS:
+			if key in rec:
+				write(',' + pad(level + 1) + _encode_json_string(key) + key_sep + _json_scalar(rec[key]))
+		write(pad(level) + '}')
+
+	write('[')
+	for i, rec in enumerate(records):
+		parent = parents[i]
+		while open_volumes and open_volumes[-1][0] != parent:
+			close_volume()
+		level = 1 if parent is None else open_volumes[-1][1] + 2
+		if list_first[-1]:
+			list_first[-1] = False
+			write(pad(level) + '{')
+		else:
+			write(',' + pad(level) + '{')
+		is_volume = rec['type'] not in ('DataCell', 'PointerCell')
+		sep = pad(level + 1)
+		for key, value in rec.items():
+			if key == 'elements' or (is_volume and key in _TRAILING_KEYS):
+				continue
+			write(sep + _encode_json_string(key) + key_sep + _json_scalar(value))
+			sep = ',' + pad(level + 1)
+		if is_volume:
+			write(sep + '"elements"' + key_sep + '[')
+			open_volumes.append((i, level))
+			list_first.append(True)
+		else:
+			write(pad(level) + '}')
+	while open_volumes:
+		close_volume()
+	write(']' if list_first[0] else pad(0) + ']')
+	f.write(''.join(out))
+
+
+# 紧凑二进制画板格式（.dsb）：
+#   魔数 | 字符串表（名字、值）| 元素数 | 按先序排列的元素
+# 元素用先序下标作为整数 id，父元素和指针目标都存为下标；整数坐标用 zigzag varint，
+# 规范格式的 uuid 存 16 字节原始值。
+BINARY_MAGIC = b'DSB\x01'
+BINARY_EXTENSION = '.dsb'
+_BINARY_TYPES = ['DataCell', 'PointerCell', 'StructBlock', 'StackQueue', 'Volume']
+_BIN_FLOAT = (1, 2, 4, 8)		# x, y, width, height 以 double 存储
+_BIN_UUID_STR = 16			# uuid 不是规范格式，存在字符串表里
+_BIN_IS_STACK = 32
+_BIN_VALUE_JSON = 64		# DataCell 的值不是字符串，以 JSON 文本存储
+_BIN_TARGET_UUID = 128		# 指针目标不在文件中，保留原 uuid 字符串
+_DOUBLE = struct.Struct('<d')
+
+
+def is_binary_board(filename):
+	return filename.lower().endswith(BINARY_EXTENSION)
+
+
+_CANONICAL_UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def _put_varint(out, n):
+	if n < 0x80:
+		out.append(n)
+		return
+	while n > 0x7F:
+		out.append((n & 0x7F) | 0x80)
+		n >>= 7
+	out.append(n)
+
+
+def write_binary_board(f, records, parents):
+	strings = {}
+	def intern(text):
+		index = strings.get(text)
+		if index is None:
+			index = strings[text] = len(strings)
+		return index
+	index_of = {}
+	for i, rec in enumerate(records):
+		index_of.setdefault(rec['uuid'], i)
+
+	body = bytearray()
+	put = _put_varint
+	for i, rec in enumerate(records):
+		kind = rec['type']
+		flags = 0
+		uid = rec['uuid']
+		raw_uuid = None
+		if _CANONICAL_UUID.fullmatch(uid):
+			raw_uuid = bytes.fromhex(uid.replace('-', ''))
+		else:
+			flags |= _BIN_UUID_STR
+		numbers = [rec['x'], rec['y'], rec['width'], rec['height']]
+		for bit, value in zip(_BIN_FLOAT, numbers):
+			if not isinstance(value, int) or isinstance(value, bool):
+				flags |= bit
+		value = rec.get('value', '')
+		if kind == 'DataCell' and not isinstance(value, str):
+			flags |= _BIN_VALUE_JSON
+			value = json.dumps(value)
+		target = rec.get('target_uuid')
+		if kind == 'PointerCell' and target and target not in index_of:
+			flags |= _BIN_TARGET_UUID
+		if kind == 'StackQueue' and rec.get('is_stack', True):
+			flags |= _BIN_IS_STACK
+
+		body.append(_BINARY_TYPES.index(kind))
+		body.append(flags)
+		if raw_uuid is None:
+			put(body, intern(uid))
+		else:
+			body += raw_uuid
+		put(body, 0 if parents[i] is None else i - parents[i])
+		for bit, number in zip(_BIN_FLOAT, numbers):
+			if flags & bit:
+				body += _DOUBLE.pack(number)
+			else:
+				put(body, (number << 1) if number >= 0 else ((-number << 1) - 1))
+		put(body, intern(rec.get('name', '')))
+		if kind == 'DataCell':
+			put(body, intern(value))
+		elif kind == 'PointerCell':
+			if flags & _BIN_TARGET_UUID:
+				put(body, intern(target))
+			else:
+				put(body, index_of[target] + 1 if target else 0)
+
+	head = bytearray(BINARY_MAGIC)
+	_put_varint(head, len(strings))
+	for text in strings:
+		data = text.encode('utf-8')
+		_put_varint(head, len(data))
+		head += data
+	_put_varint(head, len(records))
+	f.write(head)
+	f.write(body)
+
+
+def read_binary_records(f):
+	# 读入 .dsb 文件，返回与 read_board_records 相同形式的记录和父下标
+	data = f.read()
+	if data[:4] != BINARY_MAGIC:
+		raise BoardFormatError("not a binary board file")
+	pos = 4
+	def varint():
+		nonlocal pos
+		shift = 0
+		result = 0
+		while True:
+			byte = data[pos]
+			pos += 1
+			result |= (byte & 0x7F) << shift
+			if byte < 0x80:
+				return result
+			shift += 7
+	try:
+		strings = []
+		for _ in range(varint()):
+			length = varint()
+			strings.append(data[pos:pos+length].decode('utf-8'))
+			pos += length
+		count = varint()
+		records = []
+		parents = []
+		targets = []
+		for i in range(count):
+			kind = _BINARY_TYPES[data[pos]]
+			flags = data[pos+1]
+			pos += 2
+			if flags & _BIN_UUID_STR:
+				uid = strings[varint()]
+			else:
+				h = data[pos:pos+16].hex()
+				uid = f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+				pos += 16
+			delta = varint()
+			parent = i - delta if delta else None
+			numbers = []
+			for bit in _BIN_FLOAT:
+				if flags & bit:
+					numbers.append(_DOUBLE.unpack_from(data, pos)[0])
+					pos += 8
+				else:
+					n = varint()
+					numbers.append((n >> 1) if not n & 1 else -((n + 1) >> 1))
+			rec = {"type": kind, "uuid": uid, "x": numbers[0], "y": numbers[1],
+				"name": strings[varint()], "width": numbers[2], "height": numbers[3],
+				"parent_uuid": records[parent]["uuid"] if parent is not None else None}
+			if kind == 'DataCell':
+				value = strings[varint()]
+				rec["value"] = json.loads(value) if flags & _BIN_VALUE_JSON else value
+			elif kind == 'PointerCell':
+				if flags & _BIN_TARGET_UUID:
+					rec["target_uuid"] = strings[varint()]
+				else:
+					targets.append((i, varint()))
+					rec["target_uuid"] = None
+			elif kind == 'StackQueue':
+				rec["is_stack"] = bool(flags & _BIN_IS_STACK)
+			records.append(rec)
+			parents.append(parent)
+	except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+		raise BoardFormatError(f"corrupt binary board file: {e}") from None
+	for i, target in targets:
+		if target:
+			records[i]["target_uuid"] = records[target - 1]["uuid"]
+	return records, parents
+
+
+def json_to_binary(src, dst):
+	with open(src, 'rb') as f:
+		records, parents = read_board_records(f)
+	keep, _ = resolve_board_records(records, parents)
+	remap = {old: new for new, old in enumerate(keep)}
+	with open(dst, 'wb') as f:
+		write_binary_board(f, [records[i] for i in keep],
+			[remap[parents[i]] if parents[i] is not None else None for i in keep])
+
+
+def binary_to_json(src, dst):
+	with open(src, 'rb') as f:
+		records, parents = read_binary_records(f)
+	with open(dst, 'w') as f:
+		write_board_json(f, records, parents)
+
+
+class BoardMirror:
+	# 自动保存日志的镜像：后台线程按日志记录维护的一份扁平画板（uuid -> 记录，外加各容器的子元素顺序），
+	# 快照直接从这里写出，Tk 线程不必再遍历整张画板。重放规则与 replay_journal 一致
+	def __init__(self):
+		self.records = {}
+		self.children = {None: []}
+
+	def reset(self, records, parents):
+		self.records = {}
+		self.children = {None: []}
+		for rec, parent in zip(records, parents):
+			rec = dict(rec)
+			rec['parent_uuid'] = None if parent is None else records[parent]['uuid']
+			self.insert(rec)
+
+	def insert(self, rec, index=None):
+		uid = rec['uuid']
+		self.records[uid] = rec
+		if rec.get('parent_uuid') not in self.records:
+			rec['parent_uuid'] = None
+		siblings = self.children.setdefault(rec['parent_uuid'], [])
+		siblings.insert(len(siblings) if index is None else index, uid)
+
+	def detach(self, uid):
+		siblings = self.children.get(self.records[uid]['parent_uuid'], [])
+		if uid in siblings:
+			siblings.remove(uid)
+
+	def subtree(self, uid):
+		stack = [uid]
+		while stack:
+			uid = stack.pop()
+			yield uid
+			stack.extend(self.children.get(uid, ()))
+
+	def shift(self, uid, dx, dy):
+		if dx or dy:
+			for uid in self.subtree(uid):
+				rec = self.records[uid]
+				rec['x'] += dx
+				rec['y'] += dy
+
+	def apply(self, entry):
+		op = entry["op"]
+		uid = entry["uuid"]
+		rec = self.records.get(uid)
+		if op == 'create':
+			if rec is None:
+				self.insert(dict(entry["record"]))
+			return
+		if rec is None:
+			return
+		if op == 'move':
+			self.shift(uid, entry["x"] - rec['x'], entry["y"] - rec['y'])
+		elif op == 'rename':
+			rec['name'] = entry["name"]
+			if "value" in entry:
+				rec['value'] = entry["value"]
+		elif op == 'add':
+			if entry["parent"] in self.records and rec['parent_uuid'] is None:
+				self.detach(uid)
+				rec['parent_uuid'] = entry["parent"]
+				self.insert(rec, entry.get("index"))
+		elif op == 'remove':
+			if rec['parent_uuid'] is not None:
+				self.detach(uid)
+				rec['parent_uuid'] = None
+				self.insert(rec)
+			self.shift(uid, entry["x"] - rec['x'], entry["y"] - rec['y'])
+		elif op == 'arrow':
+			rec['target_uuid'] = entry["target"]
+		elif op == 'delete':
+			self.detach(uid)
+			for uid in list(self.subtree(uid)):
+				del self.records[uid]
+				self.children.pop(uid, None)
+
+	def flatten(self):
+		# 与 board_records 相同的先序扁平记录和父记录下标
+		records = []
+		parents = []
+		stack = [(uid, None) for uid in reversed(self.children[None])]
+		while stack:
+			uid, parent = stack.pop()
+			index = len(records)
+			records.append(self.records[uid])
+			parents.append(parent)
+			stack.extend((child, index) for child in reversed(self.children.get(uid, ())))
+		return records, parents
+
+
+class Journal:
+	# 自动保存：每次变动追加一条小记录到 journal.log，由后台线程写盘，Tk 线程不阻塞；
+	# 记录数达到 compact_every 时把后台维护的镜像写成快照 snapshot.<代>.json，并清空日志。
+	# 日志第一行记下它所基于的快照代号，恢复时只重放与最新快照同代的日志
+	def __init__(self, directory, board, compact_every=2000):
+		self.directory = directory
+		self.board = board
+		self.compact_every = compact_every
+		self.journal_path = os.path.join(directory, 'journal.log')
+		os.makedirs(directory, exist_ok=True)
+		# 新快照的代号接在已有快照之后，恢复之前不会覆盖上次会话留下的文件
+		self.generation = self.latest_snapshot() or 0
+		self.count = 0
+		self.based = False
+		self.mirror = BoardMirror()
+		self.queue = queue.Queue()
+		# 镜像从画板当前内容开始（窗口里此时画板还是空的）
+		self.queue.put(('rebase', (None, board_records(board.elements), ())))
+		self.worker = threading.Thread(target=self._run, name="journal", daemon=True)
+		self.worker.start()
+
+	def snapshot_path(self, generation):
+		return os.path.join(self.directory, f'snapshot.{generation}.json')
+
+	def latest_snapshot(self):
+		generations = []
+		for path in glob.glob(os.path.join(self.directory, 'snapshot.*.json')):
+			try:
+				generations.append(int(os.path.basename(path).split('.')[1]))
+			except ValueError:
+				pass
+		return max(generations, default=None)
+
+	def record(self, op, elem, data):
+		if not self.based:
+			# 第一条记录之前先写一份基础快照，日志总有它所基于的快照
+			self.checkpoint()
+		entry = {"op": op, "uuid": elem.uuid}
+		if op == 'create':
+			entry["record"] = elem.to_dict(children=False) if isinstance(elem, Volume) else elem.to_dict()
+		elif op == 'move':
+			entry["x"] = elem.x
+			entry["y"] = elem.y
+		elif op == 'rename':
+			entry["name"] = elem.name
+			if isinstance(elem, DataCell):
+				entry["value"] = elem.value
+		elif op == 'add':
+			entry["parent"] = data['parent'].uuid
+			entry["index"] = data['index']
+		elif op == 'remove':
+			entry["parent"] = data['parent'].uuid
+			entry["x"] = elem.x
+			entry["y"] = elem.y
+		elif op == 'arrow':
+			entry["target"] = elem.target.uuid if elem.target else None
+		self.queue.put(('append', entry))
+		self.count += 1
+		if self.count >= self.compact_every:
+			self.checkpoint()
+
+	def checkpoint(self):
+		# Tk 线程只发一个标记；快照由后台线程从镜像写出
+		self.generation += 1
+		self.count = 0
+		self.based = True
+		self.queue.put(('snapshot', self.generation))
+
+	def rebase(self, path, entries=()):
+		# 画板整体换成文件内容（读档、从快照恢复）之后调用：
+		# 后台线程重新读这个文件、重放日志尾部作为新的镜像，再写一份快照
+		self.queue.put(('rebase', (path, None, list(entries))))
+		self.checkpoint()
+
+	def flush(self):
+		self.queue.join()
+
+	def close(self):
+		self.queue.put(('stop', None))
+		self.worker.join()
+
+	def _run(self):
+		journal = None
+		pending_move = None
+		while True:
+			kind, payload = self.queue.get()
+			batch = [(kind, payload)]
+			# 一次取完队列里已有的记录，连续拖动同一元素只保留最后位置
+			while True:
+				try:
+					batch.append(self.queue.get_nowait())
+				except queue.Empty:
+					break
+			lines = []
+			for kind, payload in batch:
+				if kind == 'append':
+					self.mirror.apply(payload)
+					if payload["op"] == 'move' and lines and pending_move == payload["uuid"]:
+						lines[-1] = payload
+					else:
+						lines.append(payload)
+					pending_move = payload["uuid"] if payload["op"] == 'move' else None
+					continue
+				# 还没有打开日志时（只会在第一份快照之前），这些记录已在镜像里，随后的快照会包含它们
+				if lines and journal is not None:
+					journal.write(''.join(json.dumps(line) + '\n' for line in lines))
+				lines = []
+				pending_move = None
+				if kind == 'rebase':
+					self._rebase(*payload)
+				elif kind == 'snapshot':
+					generation = payload
+					records, parents = self.mirror.flatten()
+					path = self.snapshot_path(generation)
+					with open(path + '.tmp', 'w') as f:
+						write_board_json(f, records, parents, indent=None)
+						f.flush()
+						os.fsync(f.fileno())
+					os.replace(path + '.tmp', path)
+					if journal is not None:
+						journal.close()
+					journal = open(self.journal_path, 'w')
+					journal.write(json.dumps({"op": "base", "generation": generation}) + '\n')
+					for old in glob.glob(os.path.join(self.directory, 'snapshot.*.json')):
+						if old != path:
+							os.remove(old)
+				elif kind == 'stop':
+					if journal is not None:
+						journal.close()
+					for _ in batch:
+						self.queue.task_done()
+					return
+			if lines and journal is not None:
+				journal.write(''.join(json.dumps(line) + '\n' for line in lines))
+			if journal is not None:
+				journal.flush()
+			for _ in batch:
+				self.queue.task_done()
+
+	def _rebase(self, path, flat, entries):
+		if path is not None:
+			try:
+				with open(path, 'rb') as f:
+					if is_binary_board(path):
+						records, parents = read_binary_records(f)
+					else:
+						records, parents = read_board_records(f)
+			except (OSError, BoardFormatError):
+				return	# 文件刚被 Tk 线程读过，读不了时保留原来的镜像
+			keep, _ = resolve_board_records(records, parents)
+			position = {i: k for k, i in enumerate(keep)}
+			flat = ([records[i] for i in keep],
+					[None if parents[i] is None else position[parents[i]] for i in keep])
+		self.mirror.reset(*flat)
+		for entry in entries:
+			self.mirror.apply(entry)
+
+	def recover(self):
+		# 读出最新快照和与之同代的日志尾部；没有可恢复内容时返回 None
+		generation = self.latest_snapshot()
+		if generation is None:
+			return None
+		entries = []
+		try:
+			with open(self.journal_path) as f:
+				lines = f.read().splitlines()
+		except OSError:
+			lines = []
+		if lines and json.loads(lines[0]).get("generation") == generation:
+			for line in lines[1:]:
+				try:
+					entries.append(json.loads(line))
+				except ValueError:
+					break	# 崩溃时写了一半的最后一行
+		self.generation = generation
+		return self.snapshot_path(generation), entries
+
+
+def replay_journal(app, entries):
+	# 把日志记录按顺序重放到已载入快照的画板上
+	elements = {}
+	stack = list(app.elements)
+	while stack:
+		elem = stack.pop()
+		elements[elem.uuid] = elem
+		if isinstance(elem, Volume):
+			stack.extend(elem.elements)
+	for entry in entries:
+		op = entry["op"]
+		elem = elements.get(entry["uuid"])
+		if op == 'create':
+			if elem is None:
+				rec = entry["record"]
+				elem = ELEMENT_CLASSES[rec['type']].from_dict(rec, app.canvas)
+				elements[elem.uuid] = elem
+				app.elements.append(elem)
+			continue
+		if elem is None:
+			continue
+		if op == 'move':
+			elem.move(entry["x"] - elem.x, entry["y"] - elem.y)
+		elif op == 'rename':
+			elem.relabel(entry["name"], entry.get("value"))
+		elif op == 'add':
+			parent = elements.get(entry["parent"])
+			if parent is not None and elem.parent is None:
+				if elem in app.elements:
+					app.elements.remove(elem)
+				parent.add_element(elem, entry.get("index"))
+		elif op == 'remove':
+			if elem.parent is not None:
+				elem.parent.remove_element(elem)
+			if elem not in app.elements:
+				app.elements.append(elem)
+			elem.move(entry["x"] - elem.x, entry["y"] - elem.y)
+		elif op == 'arrow':
+			target = elements.get(entry["target"]) if entry["target"] else None
+			if target is not None:
+				elem.create_arrow(target)
+			elif isinstance(elem, PointerCell):
+				elem.clear_arrow()
+		elif op == 'delete':
+			elements.pop(entry["uuid"], None)
+			elem.delete()
+
+
+class History:
+	# 撤销/重做：订阅变动通知，每条记录只存增量（位移、旧名字、旧目标、父容器与下标），
+	# 不复制整张画板。一次操作（一次拖动、一次复制或删除）产生的所有增量合成一条；
+	# 被删除的元素对象本身留在记录里，撤销时重新画出即可。增量总数超过 budget 时丢弃最旧的记录
+	def __init__(self, board, budget=20000):
+		self.board = board
+		self.budget = budget
+		self.undo_stack = deque()
+		self.redo_stack = []
+		self.cost = 0
+		self.group = None
+		self.depth = 0
+		self.pending = None
+		self.replaying = False
+
+	def record(self, op, elem, data):
+		if self.replaying:
+			return
+		if self.group is None:
+			self.group = []
+		group = self.group
+		last = group[-1] if group else None
+		if op == 'move':
+			if last and last[0] == 'move' and last[1] is elem:
+				group[-1] = ('move', elem, last[2] + data['dx'], last[3] + data['dy'])
+			else:
+				group.append(('move', elem, data['dx'], data['dy']))
+		elif op == 'arrow':
+			# 拖动指针时目标会反复变化，只保留最初的旧目标和最终的新目标
+			if last and last[0] == 'arrow' and last[1] is elem:
+				group[-1] = ('arrow', elem, last[2], elem.target)
+			else:
+				group.append(('arrow', elem, data['old'], elem.target))
+		elif op == 'rename':
+			group.append(('rename', elem, data['old_name'], data['old_value'],
+				elem.name, getattr(elem, 'value', None)))
+		elif op == 'add':
+			group.append(('add', elem, data['parent'], data['index'], elem.x, elem.y))
+		elif op == 'remove':
+			group.append(('remove', elem, data['parent'], data['index']))
+		elif op in ('create', 'delete'):
+			group.append((op, elem))
+		if self.depth == 0:
+			self.schedule()
+
+	def begin(self):
+		# 鼠标按下到松开之间的所有变动合成一条记录
+		self.depth += 1
+
+	def end(self):
+		if self.depth:
+			self.depth -= 1
+		if self.depth == 0 and self.group is not None:
+			self.schedule()
+
+	def schedule(self):
+		# 在本次事件回调结束后再收尾，同一回调里的后续变动仍归入这一条
+		if self.pending is None:
+			self.pending = self.board.canvas.after_idle(self.commit)
+
+	def commit(self):
+		self.pending = None
+		if self.depth:
+			return
+		group, self.group = self.group, None
+		group = [delta for delta in group or ()
+				if not (delta[0] == 'move' and delta[2] == 0 and delta[3] == 0)
+				and not (delta[0] == 'arrow' and delta[2] is delta[3])]
+		if not group:
+			return
+		self.undo_stack.append(group)
+		self.cost += len(group)
+		self.redo_stack.clear()
+		while self.cost > self.budget and len(self.undo_stack) > 1:
+			self.cost -= len(self.undo_stack.popleft())
+
+	def clear(self):
+		if self.pending is not None:
+			self.board.canvas.after_cancel(self.pending)
+			self.pending = None
+		self.undo_stack.clear()
+		self.redo_stack.clear()
+		self.cost = 0
+		self.group = None
+		self.depth = 0
+
+	def undo(self):
+		self.flush()
+		if not self.undo_stack:
+			return False
+		group = self.undo_stack.pop()
+		self.cost -= len(group)
+		with self.replay():
+			for delta in reversed(group):
+				self.revert(delta)
+		self.redo_stack.append(group)
+		return True
+
+	def redo(self):
+		self.flush()
+		if not self.redo_stack:
+			return False
+		group = self.redo_stack.pop()
+		with self.replay():
+			for delta in group:
+				self.apply(delta)
+		self.undo_stack.append(group)
+		self.cost += len(group)
+		return True
+
+	def flush(self):
+		# 撤销前先收尾还没提交的记录
+		if self.pending is not None:
+			self.board.canvas.after_cancel(self.pending)
+		self.depth = 0
+		self.commit()
+
+	@contextmanager
+	def replay(self):
+		self.replaying = True
+		try:
+			with self.board.batch():
+				yield
+		finally:
+			self.replaying = False
+
+	def revive(self, elem, top=True):
+		# 重新画出被删除的元素；撤销/重做期间产生的变动照常写入自动保存日志
+		if elem in self.board.index:
+			return
+		elem.draw()
+		if top and elem.parent is None and elem not in self.board.elements:
+			self.board.elements.append(elem)
+		if isinstance(elem, Volume):
+			elem.update_size()
+		if isinstance(elem, PointerCell):
+			elem.schedule_arrow()
+		elem.update_arrows()
+		elem.emit('create')
+
+	def detach(self, elem):
+		if elem.parent is None and elem in self.board.elements:
+			self.board.elements.remove(elem)
+
+	def revert(self, delta):
+		op, elem = delta[0], delta[1]
+		if op == 'move':
+			elem.move(-delta[2], -delta[3])
+		elif op == 'arrow':
+			self.retarget(elem, delta[2])
+		elif op == 'rename':
+			elem.relabel(delta[2], delta[3])
+		elif op == 'add':
+			parent, _, x, y = delta[2:]
+			if elem.parent is parent:
+				parent.remove_element(elem)
+				self.board.elements.append(elem)
+				elem.move(x - elem.x, y - elem.y)
+		elif op == 'remove':
+			parent, index = delta[2:]
+			self.revive(elem, top=False)
+			self.detach(elem)
+			parent.add_element(elem, index)
+		elif op == 'create':
+			elem.delete()
+		elif op == 'delete':
+			self.revive(elem)
+
+	def apply(self, delta):
+		op, elem = delta[0], delta[1]
+		if op == 'move':
+			elem.move(delta[2], delta[3])
+		elif op == 'arrow':
+			self.retarget(elem, delta[3])
+		elif op == 'rename':
+			elem.relabel(delta[4], delta[5])
+		elif op == 'add':
+			parent, index = delta[2:4]
+			self.revive(elem, top=False)
+			self.detach(elem)
+			parent.add_element(elem, index)
+		elif op == 'remove':
+			parent = delta[2]
+			if elem.parent is parent:
+				parent.remove_element(elem)
+				self.board.elements.append(elem)
+		elif op == 'create':
+			self.revive(elem)
+		elif op == 'delete':
+			if elem in self.board.index:
+				elem.delete()
+
+	def retarget(self, pointer, target):
+		if target is None:
+			pointer.clear_arrow()
+		else:
+			pointer.create_arrow(target)
+
+
+class Reachability:
+	# 指针图的可达性（垃圾）分析。以顶层元素为对象：容器连同子元素是一个对象，
+	# 对象里任一指针指向另一对象里的任一元素，就是对象之间的一条边。
+	# 没有被其他对象指向的顶层元素是根，从根出发到不了的对象就是垃圾。
+	# reached 记录每个可达对象的“支撑”来源（根为 None）：新边只从可达端向前扩展，
+	# 断开支撑边时只重新检查它支撑的那一片，不从头重算。删除元素后在下次查询时整体重建（线性）。
+	# 遍历全部用显式栈，十万级对象也不受递归深度限制
+	def __init__(self, board):
+		self.board = board
+		self.owner = {}		# 元素 -> 所在顶层对象
+		self.out = {}		# 对象 -> {目标对象: 边数}
+		self.inc = {}		# 对象 -> {来源对象: 边数}
+		self.loops = {}		# 对象 -> 指回自身的边数
+		self.reached = {}
+		self.garbage = set()
+		self.changed = set()
+		self.sccs = None
+		self.dirty = True
+		self.active = False
+		self.pending = None
+
+	# ---- 查询 ----
+
+	def unreachable(self):
+		self.update()
+		return set(self.garbage)
+
+	def is_reachable(self, elem):
+		self.update()
+		return self.owner.get(elem) in self.reached
+
+	def components(self):
+		# 对象图的强连通分量（Tarjan，迭代实现）
+		self.update()
+		if self.sccs is not None:
+			return self.sccs
+		index = {}
+		low = {}
+		on_stack = set()
+		stack = []
+		sccs = []
+		counter = 0
+		for start in self.objects():
+			if start in index:
+				continue
+			index[start] = low[start] = counter
+			counter += 1
+			stack.append(start)
+			on_stack.add(start)
+			work = [(start, iter(self.out.get(start, ())))]
+			while work:
+				node, edges = work[-1]
+				for succ in edges:
+					if succ not in index:
+						index[succ] = low[succ] = counter
+						counter += 1
+						stack.append(succ)
+						on_stack.add(succ)
+						work.append((succ, iter(self.out.get(succ, ()))))
+						break
+					if succ in on_stack and index[succ] < low[node]:
+						low[node] = index[succ]
+				else:
+					work.pop()
+					if work:
+						parent = work[-1][0]
+						if low[node] < low[parent]:
+							low[parent] = low[node]
+					if low[node] == index[node]:
+						scc = []
+						while True:
+							member = stack.pop()
+							on_stack.discard(member)
+							scc.append(member)
+							if member is node:
+								break
+						sccs.append(scc)
+		self.sccs = sccs
+		return sccs
+
+	def cycles(self):
+		# 含环的分量：多于一个对象，或对象里有指针指回自身
+		return [scc for scc in self.components() if len(scc) > 1 or scc[0] in self.loops]
+
+	def objects(self):
+		return [elem for elem, obj in self.owner.items() if elem is obj]
+
+	# ---- 维护 ----
+
+	def start(self):
+		# 打开实时分析：订阅变动通知，垃圾对象高亮显示
+		if self.active:
+			return
+		self.active = True
+		self.board.changes.listeners.append(self.on_change)
+		self.dirty = True
+		self.changed.update(self.garbage)
+		self.apply()
+
+	def stop(self):
+		if not self.active:
+			return
+		self.active = False
+		self.board.changes.listeners.remove(self.on_change)
+		if self.pending is not None:
+			self.board.canvas.after_cancel(self.pending)
+			self.pending = None
+		for obj in self.garbage:
+			obj.set_highlight(obj in self.board.selection)
+		self.changed.clear()
+		self.dirty = True
+
+	def invalidate(self):
+		self.dirty = True
+		self.schedule()
+
+	def update(self):
+		if self.dirty or not self.active:
+			self.rebuild()
+
+	def rebuild(self):
+		old = self.garbage
+		self.garbage = set()
+		self.owner = owner = {}
+		self.out = {}
+		self.inc = {}
+		self.loops = {}
+		self.reached = {}
+		self.sccs = None
+		for obj in self.board.elements:
+			stack = [obj]
+			while stack:
+				elem = stack.pop()
+				owner[elem] = obj
+				if isinstance(elem, Volume):
+					stack.extend(elem.elements)
+		for elem, obj in owner.items():
+			target = getattr(elem, 'target', None)
+			if target is not None:
+				self.add_edge(obj, owner.get(target), spread=False)
+		roots = [obj for obj in self.board.elements if obj not in self.inc]
+		for obj in roots:
+			self.reached[obj] = None
+		self.spread(roots)
+		self.garbage = {obj for obj in self.board.elements if obj not in self.reached}
+		if self.active:
+			self.changed.update(old ^ self.garbage)
+		self.dirty = False
+
+	def on_change(self, op, elem, data):
+		if self.dirty:
+			return
+		if op == 'arrow':
+			self.retarget(elem, data['old'], elem.target)
+		elif op == 'create' and elem.parent is None and elem not in self.owner \
+				and not getattr(elem, 'elements', None) and getattr(elem, 'target', None) is None:
+			self.owner[elem] = elem
+			self.reached[elem] = None
+		elif op == 'add' and self.owner.get(elem) is elem and data['parent'] in self.owner:
+			self.reown(elem, self.owner[data['parent']])
+		elif op == 'remove' and elem.parent is None and elem in self.owner:
+			self.reown(elem, elem)
+		elif op not in ('move', 'rename'):
+			self.dirty = True
+		self.schedule()
+
+	def retarget(self, pointer, old, new):
+		u = self.owner.get(pointer)
+		if u is None or (old is not None and old not in self.owner) \
+				or (new is not None and new not in self.owner):
+			self.dirty = True
+			return
+		if new is not None:
+			self.add_edge(u, self.owner[new])
+		if old is not None:
+			self.remove_edge(u, self.owner[old])
+
+	def reown(self, elem, obj):
+		# 元素移入/移出容器：子树换了所属对象，相关的边先按旧归属拆掉，再按新归属接上
+		members = []
+		stack = [elem]
+		while stack:
+			member = stack.pop()
+			members.append(member)
+			if isinstance(member, Volume):
+				stack.extend(member.elements)
+		edges = getattr(self.board.canvas, 'edges', None)
+		pointers = set()
+		for member in members:
+			if getattr(member, 'target', None) is not None:
+				pointers.add(member)
+			if edges is not None:
+				pointers.update(edges.pointers_to(member))
+		if any(p not in self.owner or p.target not in self.owner for p in pointers):
+			self.dirty = True
+			return
+		for pointer in pointers:
+			self.remove_edge(self.owner[pointer], self.owner[pointer.target])
+		if obj is not elem:
+			# 原来的顶层对象并入容器，此时它已没有边
+			self.reached.pop(elem, None)
+			if elem in self.garbage:
+				self.garbage.discard(elem)
+				self.changed.add(elem)
+		for member in members:
+			self.owner[member] = obj
+		if obj is elem:
+			self.reached[elem] = None
+		for pointer in pointers:
+			self.add_edge(self.owner[pointer], self.owner[pointer.target])
+
+	def add_edge(self, u, v, spread=True):
+		if v is None:
+			return
+		self.sccs = None
+		if u is v:
+			self.loops[u] = self.loops.get(u, 0) + 1
+			return
+		out = self.out.setdefault(u, {})
+		out[v] = out.get(v, 0) + 1
+		inc = self.inc.get(v)
+		was_root = inc is None
+		if was_root:
+			inc = self.inc[v] = {}
+		inc[u] = inc.get(u, 0) + 1
+		if not spread:
+			return
+		if was_root and v in self.reached:
+			# v 不再是根，要重新找支撑
+			self.repair(v)
+		elif u in self.reached and v not in self.reached:
+			self.reached[v] = u
+			self.spread([v])
+
+	def remove_edge(self, u, v):
+		self.sccs = None
+		if u is v:
+			count = self.loops[u] - 1
+			if count:
+				self.loops[u] = count
+			else:
+				del self.loops[u]
+			return
+		out = self.out[u]
+		out[v] -= 1
+		if out[v]:
+			self.inc[v][u] -= 1
+			return
+		del out[v]
+		if not out:
+			del self.out[u]
+		inc = self.inc[v]
+		del inc[u]
+		if not inc:
+			# 没有对象再指向 v，v 成为根
+			del self.inc[v]
+			if v not in self.reached:
+				self.reached[v] = None
+				self.spread([v])
+			else:
+				self.reached[v] = None
+		elif self.reached.get(v) is u:
+			self.repair(v)
+
+	def spread(self, frontier):
+		reached = self.reached
+		stack = list(frontier)
+		while stack:
+			u = stack.pop()
+			if u in self.garbage:
+				self.garbage.discard(u)
+				self.changed.add(u)
+			for v in self.out.get(u, ()):
+				if v not in reached:
+					reached[v] = u
+					stack.append(v)
+
+	def repair(self, v):
+		# v 失去支撑：由它（直接或间接）支撑的对象先全部视为不可达，
+		# 其中仍有可达来源的重新接上并向前扩展，剩下的就是新产生的垃圾
+		reached = self.reached
+		suspect = {v}
+		stack = [v]
+		while stack:
+			u = stack.pop()
+			for w in self.out.get(u, ()):
+				if w not in suspect and reached.get(w) is u:
+					suspect.add(w)
+					stack.append(w)
+		for u in suspect:
+			del reached[u]
+		frontier = []
+		for u in suspect:
+			inc = self.inc.get(u)
+			if inc is None:
+				reached[u] = None
+				frontier.append(u)
+				continue
+			for w in inc:
+				if w in reached:
+					reached[u] = w
+					frontier.append(u)
+					break
+		self.spread(frontier)
+		for u in suspect:
+			if u not in reached and u not in self.garbage:
+				self.garbage.add(u)
+				self.changed.add(u)
+
+	def schedule(self):
+		if self.active and self.pending is None:
+			self.pending = self.board.canvas.after_idle(self.apply)
+
+	def apply(self):
+		# 把垃圾集合的变化反映到高亮上
+		self.pending = None
+		if not self.active:
+			return
+		if self.dirty:
+			self.rebuild()
+		changed, self.changed = self.changed, set()
+		selection = self.board.selection
+		for obj in changed:
+			state = obj in self.garbage or obj in selection
+			if obj.selected != state:
+				obj.set_highlight(state)
+
+
+LAYOUT_GAP_X = 40
+LAYOUT_GAP_Y = 60
+LAYOUT_CELL_CAP = 8	# 力导向斥力：节点多于此数的网格按重心整体计算
+
+
+def pointer_graph(objects):
+	# 顶层对象之间的有向边 (i, j)：对象 i 里有指针指向对象 j 里的元素。去重、忽略自环，按元素先序排列
+	owner = {}
+	for i, obj in enumerate(objects):
+		stack = [obj]
+		while stack:
+			elem = stack.pop()
+			owner[elem] = i
+			if isinstance(elem, Volume):
+				stack.extend(reversed(elem.elements))
+	edges = []
+	seen = set()
+	for elem, i in owner.items():
+		target = getattr(elem, 'target', None)
+		j = owner.get(target) if target is not None else None
+		if j is not None and j != i and (i, j) not in seen:
+			seen.add((i, j))
+			edges.append((i, j))
+	return edges
+
+
+def topological_order(n, edges):
+	# Kahn 算法；有环时返回的序列短于 n
+	children = [[] for _ in range(n)]
+	indegree = [0] * n
+	for i, j in edges:
+		children[i].append(j)
+		indegree[j] += 1
+	order = [i for i in range(n) if not indegree[i]]
+	for v in order:
+		for c in children[v]:
+			indegree[c] -= 1
+			if not indegree[c]:
+				order.append(c)
+	return order
+
+
+def _layer_tops(heights, gap_y):
+	tops = []
+	y = 0.0
+	for h in heights:
+		tops.append(y)
+		y += h + gap_y
+	return tops
+
+
+def _merge_contour(front, back):
+	# 轮廓为 [偏移, deque]：共同深度取 front 的值，更深处取 back 的值。
+	# 保留较长的那条原地改写，只花较短一侧的时间，整棵树合并下来是线性的
+	off_f, f = front
+	off_b, b = back
+	if len(f) >= len(b):
+		return front
+	for d, value in enumerate(f):
+		b[d] = value + off_f - off_b
+	return back
+
+
+def layout_tree(sizes, edges, gap_x=LAYOUT_GAP_X, gap_y=LAYOUT_GAP_Y):
+	# Reingold–Tilford：自底向上把相邻子树按左右轮廓尽量靠拢，父节点居中于子节点之上。
+	# 返回各节点左上角坐标；森林的各棵树按同样方式并排
+	n = len(sizes)
+	children = [[] for _ in range(n)]
+	has_parent = [False] * n
+	for i, j in edges:
+		children[i].append(j)
+		has_parent[j] = True
+	roots = [i for i in range(n) if not has_parent[i]]
+	order = []
+	depth = [0] * n
+	stack = roots[::-1]
+	while stack:
+		v = stack.pop()
+		order.append(v)
+		for c in reversed(children[v]):
+			depth[c] = depth[v] + 1
+			stack.append(c)
+	left = [None] * n
+	right = [None] * n
+	rel = [0.0] * n
+
+	def place(kids):
+		# 相邻子树靠拢：只比较已放好部分的右轮廓和新子树的左轮廓
+		acc_l, acc_r = left[kids[0]], right[kids[0]]
+		pos = [0.0]
+		for c in kids[1:]:
+			cl, cr = left[c], right[c]
+			off_r, off_l = acc_r[0], cl[0]
+			shift = max(r + off_r - l - off_l for r, l in zip(acc_r[1], cl[1])) + gap_x
+			pos.append(shift)
+			cl[0] += shift
+			cr[0] += shift
+			acc_r = _merge_contour(cr, acc_r)
+			acc_l = _merge_contour(acc_l, cl)
+		return pos, acc_l, acc_r
+
+	for v in reversed(order):
+		half = sizes[v][0] / 2
+		kids = children[v]
+		if not kids:
+			left[v] = [0.0, deque([-half])]
+			right[v] = [0.0, deque([half])]
+			continue
+		pos, acc_l, acc_r = place(kids)
+		mid = (pos[0] + pos[-1]) / 2
+		for c, p in zip(kids, pos):
+			rel[c] = p - mid
+			left[c] = right[c] = None
+		acc_l[0] -= mid
+		acc_r[0] -= mid
+		acc_l[1].appendleft(-half - acc_l[0])
+		acc_r[1].appendleft(half - acc_r[0])
+		left[v], right[v] = acc_l, acc_r
+
+	x = [0.0] * n
+	if roots:
+		pos, _, _ = place(roots)
+		for v, p in zip(roots, pos):
+			x[v] = p
+	for v in order:
+		for c in children[v]:
+			x[c] = x[v] + rel[c]
+	heights = [0.0] * (max(depth, default=0) + 1)
+	for v in range(n):
+		heights[depth[v]] = max(heights[depth[v]], sizes[v][1])
+	tops = _layer_tops(heights, gap_y)
+	return [(x[v] - sizes[v][0] / 2, tops[depth[v]]) for v in range(n)]
+
+
+def layout_layered(sizes, edges, order, sweeps=4, gap_x=LAYOUT_GAP_X, gap_y=LAYOUT_GAP_Y):
+	# 有向无环图的分层布局（Sugiyama）：最长路径分层，上下交替按重心排序以减少交叉，
+	# 每层从左到右排开后居中。跨多层的边不插虚拟节点
+	n = len(sizes)
+	children = [[] for _ in range(n)]
+	parents = [[] for _ in range(n)]
+	for i, j in edges:
+		children[i].append(j)
+		parents[j].append(i)
+	layer = [0] * n
+	for v in order:
+		for c in children[v]:
+			if layer[c] <= layer[v]:
+				layer[c] = layer[v] + 1
+	layers = [[] for _ in range(max(layer, default=0) + 1)]
+	for v in order:
+		layers[layer[v]].append(v)
+	rank = [0.0] * n
+	for nodes in layers:
+		for k, v in enumerate(nodes):
+			rank[v] = k
+
+	def sort_layer(nodes, neighbors):
+		def key(v):
+			near = neighbors[v]
+			return sum(rank[u] for u in near) / len(near) if near else rank[v]
+		nodes.sort(key=key)
+		for k, v in enumerate(nodes):
+			rank[v] = k
+
+	for _ in range(sweeps):
+		for nodes in layers[1:]:
+			sort_layer(nodes, parents)
+		for nodes in reversed(layers[:-1]):
+			sort_layer(nodes, children)
+
+	tops = _layer_tops([max(sizes[v][1] for v in nodes) for nodes in layers], gap_y)
+	result = [None] * n
+	for d, nodes in enumerate(layers):
+		total = sum(sizes[v][0] for v in nodes) + gap_x * (len(nodes) - 1)
+		x = -total / 2
+		for v in nodes:
+			result[v] = (x, tops[d])
+			x += sizes[v][0] + gap_x
+	return result
+
+
+def _grid_pairs(cells, cap=None):
+	# 相同或相邻网格里的所有节点对 (i, j)，i != j；全部用数组运算生成。
+	# 给出 cap 时，节点数超过 cap 的网格不再逐个展开，改为 (节点, 网格下标) 对交给调用方按重心近似，
+	# 每个节点的配对数因此有上限；此时另外返回每个节点所在的网格下标
+	cells = cells - cells.min(axis=0) + 1
+	span = int(cells[:, 1].max()) + 2
+	key = cells[:, 0] * span + cells[:, 1]
+	order = np.argsort(key, kind='stable')
+	keys, start, count = np.unique(key[order], return_index=True, return_counts=True)
+	cell_of = np.searchsorted(keys, key)
+	empty = np.zeros(0, dtype=np.int64)
+	pairs_i = [empty]
+	pairs_j = [empty]
+	far_i = [empty]
+	far_cell = [empty]
+	for ox in (-1, 0, 1):
+		for oy in (-1, 0, 1):
+			# 邻格按网格查一次，再按节点所在网格展开
+			want = keys + ox * span + oy
+			near = np.minimum(np.searchsorted(keys, want), len(keys) - 1)
+			near[keys[near] != want] = -1
+			loc = near[cell_of]
+			hit = np.nonzero(loc >= 0)[0]
+			if cap is not None:
+				big = count[loc[hit]] > cap
+				far_i.append(hit[big])
+				far_cell.append(loc[hit[big]])
+				hit = hit[~big]
+			cnt = count[loc[hit]]
+			total = int(cnt.sum())
+			if not total:
+				continue
+			first = np.repeat(start[loc[hit]], cnt)
+			step = np.arange(total) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+			pairs_i.append(np.repeat(hit, cnt))
+			pairs_j.append(order[first + step])
+	i = np.concatenate(pairs_i)
+	j = np.concatenate(pairs_j)
+	keep = i != j
+	if cap is None:
+		return i[keep], j[keep]
+	return i[keep], j[keep], np.concatenate(far_i), np.concatenate(far_cell), cell_of
+
+
+def layout_force(sizes, edges, iterations=80, seed=0, gap_x=LAYOUT_GAP_X, cap=LAYOUT_CELL_CAP):
+	# 力导向布局（Fruchterman–Reingold，网格近似）：斥力只在相邻网格内计算，边上为引力，温度逐步降低。
+	# 节点挤在一起时相邻网格里的节点对会接近 n²，所以节点多于 cap 的网格只按重心和总数算一次斥力
+	# （Barnes–Hut 式近似），每个节点每轮的计算量有上限。
+	# 有 NumPy 时整轮迭代向量化，没有时退回逐格计算
+	n = len(sizes)
+	if n == 0:
+		return []
+	k = sum(max(w, h) for w, h in sizes) / n + gap_x
+	side = k * math.sqrt(n)
+	rng = random.Random(seed)
+	start = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(n)]
+	temperature = side / 10
+	cooling = temperature / (iterations + 1)
+	if np is not None:
+		pos = np.array(start)
+		src = np.array([i for i, _ in edges], dtype=np.int64)
+		dst = np.array([j for _, j in edges], dtype=np.int64)
+		for _ in range(iterations):
+			disp = np.zeros((n, 2))
+			i, j, far_i, far_cell, cell_of = _grid_pairs(np.floor(pos / (2 * k)).astype(np.int64), cap)
+			delta = pos[i] - pos[j]
+			dist2 = np.maximum((delta * delta).sum(axis=1), 0.01)
+			push = delta * (k * k / dist2)[:, None]
+			disp[:, 0] += np.bincount(i, push[:, 0], minlength=n)
+			disp[:, 1] += np.bincount(i, push[:, 1], minlength=n)
+			if len(far_i):
+				# 大网格按重心计算，节点自己所在的网格先扣掉自己
+				count = np.bincount(cell_of).astype(float)
+				sums = np.stack([np.bincount(cell_of, pos[:, 0]), np.bincount(cell_of, pos[:, 1])], axis=1)
+				own = cell_of[far_i] == far_cell
+				mass = count[far_cell] - own
+				center = (sums[far_cell] - pos[far_i] * own[:, None]) / mass[:, None]
+				delta = pos[far_i] - center
+				dist2 = np.maximum((delta * delta).sum(axis=1), 0.01)
+				push = delta * (k * k * mass / dist2)[:, None]
+				disp[:, 0] += np.bincount(far_i, push[:, 0], minlength=n)
+				disp[:, 1] += np.bincount(far_i, push[:, 1], minlength=n)
+			if len(src):
+				delta = pos[src] - pos[dst]
+				pull = delta * (np.sqrt((delta * delta).sum(axis=1)) / k)[:, None]
+				disp[:, 0] += np.bincount(dst, pull[:, 0], minlength=n) - np.bincount(src, pull[:, 0], minlength=n)
+				disp[:, 1] += np.bincount(dst, pull[:, 1], minlength=n) - np.bincount(src, pull[:, 1], minlength=n)
+			# 弱向心力，孤立的分量不会漂得太远
+			disp -= (pos - pos.mean(axis=0)) * 0.01
+			length = np.maximum(np.sqrt((disp * disp).sum(axis=1)), 1e-9)
+			pos += disp * (np.minimum(length, temperature) / length)[:, None]
+			temperature -= cooling
+		centers = _separate(pos, sizes).tolist()
+	else:
+		centers = [list(p) for p in start]
+		size = 2 * k
+		for _ in range(iterations):
+			disp = [[0.0, 0.0] for _ in range(n)]
+			grid = {}
+			for v, (x, y) in enumerate(centers):
+				grid.setdefault((int(x // size), int(y // size)), []).append(v)
+			sums = {}
+			for cell, members in grid.items():
+				if len(members) > cap:
+					sums[cell] = (sum(centers[u][0] for u in members), sum(centers[u][1] for u in members))
+			for (cx, cy), members in grid.items():
+				near = []
+				far = []
+				for cell in [(cx + ox, cy + oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1)]:
+					if cell in sums:
+						far.append(cell)
+					else:
+						near.extend(grid.get(cell, ()))
+				for v in members:
+					x, y = centers[v]
+					for u in near:
+						if u != v:
+							dx = x - centers[u][0]
+							dy = y - centers[u][1]
+							f = k * k / max(dx * dx + dy * dy, 0.01)
+							disp[v][0] += dx * f
+							disp[v][1] += dy * f
+					for cell in far:
+						sx, sy = sums[cell]
+						mass = len(grid[cell])
+						if cell == (cx, cy):
+							sx -= x
+							sy -= y
+							mass -= 1
+						dx = x - sx / mass
+						dy = y - sy / mass
+						f = k * k * mass / max(dx * dx + dy * dy, 0.01)
+						disp[v][0] += dx * f
+						disp[v][1] += dy * f
+			for i, j in edges:
+				dx = centers[i][0] - centers[j][0]
+				dy = centers[i][1] - centers[j][1]
+				f = math.sqrt(dx * dx + dy * dy) / k
+				disp[i][0] -= dx * f
+				disp[i][1] -= dy * f
+				disp[j][0] += dx * f
+				disp[j][1] += dy * f
+			mx = sum(p[0] for p in centers) / n
+			my = sum(p[1] for p in centers) / n
+			for v, (x, y) in enumerate(centers):
+				dx = disp[v][0] - (x - mx) * 0.01
+				dy = disp[v][1] - (y - my) * 0.01
+				length = max(math.sqrt(dx * dx + dy * dy), 1e-9)
+				scale = min(length, temperature) / length
+				centers[v] = [x + dx * scale, y + dy * scale]
+			temperature -= cooling
+		centers = _separate(centers, sizes)
+	return [(x - w / 2, y - h / 2) for (x, y), (w, h) in zip(centers, sizes)]
+
+
+def _separate(centers, sizes, margin=10, rounds=200, grow=1.02):
+	# 力导向只管中心距离，矩形仍可能重叠：每轮把重叠的两框沿重叠较小的方向各推开一半，
+	# 再以重心为中心整体放大一点，挤成一团的地方才有空间散开
+	# 两框重叠时中心距离不超过最大边长加 margin，网格取这个大小，重叠的框总在相同或相邻网格里
+	n = len(sizes)
+	size = max(max(w, h) for w, h in sizes) + margin
+	if np is not None:
+		pos = np.array(centers, dtype=float)
+		half = np.array(sizes, dtype=float) / 2 + margin / 2
+		for _ in range(rounds):
+			i, j = _grid_pairs(np.floor(pos / size).astype(np.int64))
+			keep = i < j
+			i, j = i[keep], j[keep]
+			delta = pos[i] - pos[j]
+			over = half[i] + half[j] - np.abs(delta)
+			hit = (over[:, 0] > 0) & (over[:, 1] > 0)
+			if not hit.any():
+				break
+			i, j, delta, over = i[hit], j[hit], delta[hit], over[hit]
+			along_x = over[:, 0] < over[:, 1]
+			sign = np.where(delta >= 0, 1.0, -1.0)
+			push = np.zeros_like(delta)
+			push[:, 0] = np.where(along_x, over[:, 0] * sign[:, 0] / 2, 0.0)
+			push[:, 1] = np.where(along_x, 0.0, over[:, 1] * sign[:, 1] / 2)
+			for axis in (0, 1):
+				pos[:, axis] += np.bincount(i, push[:, axis], minlength=n) - np.bincount(j, push[:, axis], minlength=n)
+			center = pos.mean(axis=0)
+			pos = center + (pos - center) * grow
+		return pos
+	centers = [list(p) for p in centers]
+	for _ in range(rounds):
+		grid = {}
+		for v, (x, y) in enumerate(centers):
+			grid.setdefault((int(x // size), int(y // size)), []).append(v)
+		moved = False
+		for (cx, cy), members in grid.items():
+			near = [u for ox in (-1, 0, 1) for oy in (-1, 0, 1) for u in grid.get((cx + ox, cy + oy), ())]
+			for v in members:
+				for u in near:
+					if u <= v:
+						continue
+					dx = centers[v][0] - centers[u][0]
+					dy = centers[v][1] - centers[u][1]
+					over_x = (sizes[v][0] + sizes[u][0]) / 2 + margin - abs(dx)
+					over_y = (sizes[v][1] + sizes[u][1]) / 2 + margin - abs(dy)
+					if over_x <= 0 or over_y <= 0:
+						continue
+					moved = True
+					if over_x < over_y:
+						step = over_x / 2 if dx >= 0 else -over_x / 2
+						centers[v][0] += step
+						centers[u][0] -= step
+					else:
+						step = over_y / 2 if dy >= 0 else -over_y / 2
+						centers[v][1] += step
+						centers[u][1] -= step
+		if not moved:
+			break
+		mx = sum(p[0] for p in centers) / n
+		my = sum(p[1] for p in centers) / n
+		centers = [[mx + (x - mx) * grow, my + (y - my) * grow] for x, y in centers]
+	return centers
+
+
+def compute_layout(sizes, positions, edges, method='auto'):
+	# 按图的形状选算法：森林 → 树布局，有向无环图 → 分层，否则力导向。
+	# 结果平移到原来包围盒的左上角，整体不离开原处
+	n = len(sizes)
+	if not n:
+		return method, []
+	order = topological_order(n, edges)
+	if method == 'auto':
+		if len(order) < n:
+			method = 'force'
+		elif len({j for _, j in edges}) == len(edges):
+			method = 'tree'
+		else:
+			method = 'layered'
+	if method == 'tree':
+		if len(order) < n or len({j for _, j in edges}) != len(edges):
+			raise ValueError("tree layout needs a forest of pointers")
+		targets = layout_tree(sizes, edges)
+	elif method == 'layered':
+		if len(order) < n:
+			raise ValueError("layered layout needs an acyclic pointer graph")
+		targets = layout_layered(sizes, edges, order)
+	elif method == 'force':
+		targets = layout_force(sizes, edges)
+	else:
+		raise ValueError(f"unknown layout method: {method!r}")
+	dx = min(x for x, _ in positions) - min(x for x, _ in targets)
+	dy = min(y for _, y in positions) - min(y for _, y in targets)
+	return method, [(x + dx, y + dy) for x, y in targets]
+
+
+class AutoLayout:
+	# 按指针图自动排布顶层对象。主线程只取快照和移动元素，算法在后台线程里跑；
+	# 算完后分帧动画移到目标位置，中间帧不发变动通知，结束时每个对象发一条位移，整个过程是一条撤销记录
+	FRAMES = 15
+	FRAME_MS = 16
+
+	def __init__(self, board):
+		self.board = board
+		self.results = queue.Queue()
+		self.generation = 0
+		self.worker = None
+		self.poll_id = None
+		self.frame_id = None
+		self.moves = None
+		self.frame = 0
+		self.method = None
+
+	def snapshot(self):
+		self.board.flush()
+		objects = list(self.board.elements)
+		sizes = [(obj.width, obj.height) for obj in objects]
+		positions = [(obj.x, obj.y) for obj in objects]
+		return objects, sizes, positions, pointer_graph(objects)
+
+	def arrange(self, method='auto'):
+		# 同步排布，不动画（脚本与无界面时使用）
+		self.cancel()
+		objects, sizes, positions, edges = self.snapshot()
+		self.method, targets = compute_layout(sizes, positions, edges, method)
+		with self.board.batch():
+			for obj, (x, y) in zip(objects, targets):
+				obj.move(x - obj.x, y - obj.y)
+		return self.method
+
+	def start(self, method='auto'):
+		self.cancel()
+		objects, sizes, positions, edges = self.snapshot()
+		generation = self.generation
+
+		def work():
+			try:
+				result = compute_layout(sizes, positions, edges, method)
+			except Exception as e:
+				result = e
+			self.results.put((generation, objects, result))
+
+		self.worker = threading.Thread(target=work, name="layout", daemon=True)
+		self.worker.start()
+		self.poll_id = self.board.canvas.after(self.FRAME_MS, self.poll)
+
+	def poll(self):
+		self.poll_id = None
+		try:
+			generation, objects, result = self.results.get_nowait()
+		except queue.Empty:
+			self.poll_id = self.board.canvas.after(self.FRAME_MS, self.poll)
+			return
+		if generation != self.generation:
+			return
+		if isinstance(result, Exception):
+			# 在 Tk 的定时回调里抛出只会打印到终端，界面上什么也看不到；没有 Tk 时照常抛出
+			if tk is None:
+				raise result
+			messagebox.showerror("Auto Layout", str(result))
+			return
+		self.method, targets = result
+		index = self.board.index
+		self.moves = [[obj, x - obj.x, y - obj.y, 0.0, 0.0]
+			for obj, (x, y) in zip(objects, targets) if obj in index and obj.parent is None]
+		self.frame = 0
+		self.board.history.begin()
+		self.step()
+
+	def step(self):
+		self.frame_id = None
+		self.frame += 1
+		t = min(self.frame / self.FRAMES, 1.0)
+		ease = t * t * (3 - 2 * t)
+		with self.board.changes.mute(), self.board.batch():
+			for move in self.moves:
+				obj, dx, dy, done_x, done_y = move
+				if obj.parent is not None or obj not in self.board.index:
+					continue
+				obj.move(dx * ease - done_x, dy * ease - done_y)
+				move[3] = dx * ease
+				move[4] = dy * ease
+		if t < 1.0:
+			self.frame_id = self.board.canvas.after(self.FRAME_MS, self.step)
+		else:
+			self.finish()
+
+	def finish(self):
+		moves, self.moves = self.moves, None
+		for obj, _, _, done_x, done_y in moves:
+			if (done_x or done_y) and obj in self.board.index:
+				obj.emit('move', dx=done_x, dy=done_y)
+		self.board.history.end()
+
+	def cancel(self):
+		# 丢弃还在计算的结果；动画进行到一半时停在当前位置
+		self.generation += 1
+		canvas = self.board.canvas
+		for token in (self.poll_id, self.frame_id):
+			if token is not None:
+				canvas.after_cancel(token)
+		self.poll_id = self.frame_id = None
+		if self.moves is not None:
+			self.finish()
+
+
+class Animator:
+	# 分步动画（教学、录屏）：操作排队依次执行。每一步先在模型上一次做到终态（撤销记录、通知照常），
+	# 再把涉及的元素退回起点，逐帧插值移到终点；中间帧不发变动通知。
+	# 所有动画共用一个 after 定时器，进度按实际经过的时间推进：一帧画得慢就跳过中间帧，不会积压
+	FRAME_MS = 16
+	DURATION = 0.4		# 速度为 1 时每一步的秒数
+	SPEEDS = (0.25, 4.0)
+
+	def __init__(self, board):
+		self.board = board
+		self.steps = deque()
+		self.moves = None
+		self.arrows = None
+		self.progress = 0.0
+		self.speed = 1.0
+		self.playing = True
+		self.stepping = False
+		self.timer = None
+		self.last = None
+
+	@property
+	def busy(self):
+		return self.moves is not None or bool(self.steps)
+
+	def run(self, action, *watch, arrows=()):
+		# 排队一步：action 修改模型，watch 中的元素（及容器的子元素）位置变化时动画过去，
+		# arrows 中指针的箭头从旧终点扫到新终点
+		self.steps.append((action, watch, arrows))
+		if self.playing and not self.stepping and self.timer is None and self.moves is None and len(self.steps) == 1:
+			# 空闲时立即执行，模型变动与触发它的操作（一次拖放）归入同一条撤销记录
+			self.tick()
+		else:
+			self.schedule()
+
+	def push(self, volume, elem):
+		# 入栈 / 入队
+		def action():
+			if elem.parent is not None:
+				return
+			volume.add_element(elem)
+			if elem in self.board.elements:
+				self.board.elements.remove(elem)
+		self.run(action, volume, elem)
+
+	def pop(self, volume):
+		# 出栈 / 出队，弹出的元素放在容器右侧
+		self.run(lambda: self.board.pop(volume), volume)
+
+	def retarget(self, pointer, target):
+		self.run(lambda: pointer.create_arrow(target), pointer, arrows=(pointer,))
+
+	def play(self):
+		self.playing = True
+		self.stepping = False
+		self.last = None
+		self.schedule()
+
+	def pause(self):
+		self.playing = False
+		self.stepping = False
+		if self.timer is not None:
+			self.board.canvas.after_cancel(self.timer)
+			self.timer = None
+
+	def step(self):
+		# 暂停时：把进行到一半的这一步放完，或者放下一步，然后停住
+		self.playing = True
+		self.stepping = True
+		self.last = None
+		self.schedule()
+
+	def set_speed(self, speed):
+		low, high = self.SPEEDS
+		self.speed = min(max(speed, low), high)
+
+	def schedule(self, delay=None):
+		if self.timer is None and self.playing and self.busy:
+			self.timer = self.board.canvas.after(self.FRAME_MS if delay is None else delay, self.tick)
+
+	def tick(self):
+		self.timer = None
+		start = time.perf_counter()
+		if self.moves is None:
+			if not self.steps or not self.begin(*self.steps.popleft()):
+				self.schedule()
+				return
+		elif self.last is not None:
+			self.progress = min(1.0, self.progress + (start - self.last) * self.speed / self.DURATION)
+		self.last = start
+		self.render()
+		if self.progress >= 1.0:
+			self.finish()
+			if self.stepping:
+				self.pause()
+		# 扣掉这一帧自身的耗时，保持固定帧率
+		cost = int((time.perf_counter() - start) * 1000)
+		self.schedule(max(1, self.FRAME_MS - cost))
+
+	def begin(self, action, watch, arrows):
+		board = self.board
+		index = board.index
+		if not all(elem in index for elem in watch):
+			return False
+		board.layout.flush()
+		board.arrow_router.flush()
+
+		def involved():
+			found = set()
+			for elem in watch:
+				found.add(elem)
+				if elem.parent is not None:
+					found.update(elem.parent.elements)
+				if isinstance(elem, Volume):
+					found.update(elem.elements)
+			return found
+
+		before = {elem: (elem.x, elem.y) for elem in involved()}
+		sweep = [(pointer, self.arrow_end(pointer)) for pointer in arrows]
+		board.history.begin()
+		try:
+			action()
+		finally:
+			board.history.end()
+		board.layout.flush()
+		board.arrow_router.flush()
+
+		moves = []
+		for elem in involved() & before.keys():
+			if elem not in index:
+				continue
+			x, y = before[elem]
+			if x != elem.x or y != elem.y:
+				depth = 0
+				parent = elem.parent
+				while parent is not None:
+					depth += 1
+					parent = parent.parent
+				moves.append((depth, elem, elem.x, elem.y, elem.x - x, elem.y - y))
+		# 祖先先就位，子元素再修正剩下的相对位移
+		moves.sort(key=lambda move: move[0])
+		self.moves = [move[1:] for move in moves]
+		self.arrows = [(pointer, end) for pointer, end in sweep if pointer.target is not None]
+		self.progress = 0.0
+		return True
+
+	def arrow_end(self, pointer):
+		target = pointer.target
+		if target is None:
+			return pointer.x + 60, pointer.y + 30
+		return clip_arrow(pointer.x + 60, pointer.y + 30, target.x, target.y, target.width, target.height)
+
+	def render(self):
+		t = self.progress
+		rest = 1.0 - t * t * (3 - 2 * t)
+		board = self.board
+		index = board.index
+		with board.changes.mute(), board.batch():
+			for elem, end_x, end_y, dx, dy in self.moves:
+				if elem in index:
+					elem.move(end_x - dx * rest - elem.x, end_y - dy * rest - elem.y)
+		for pointer, (old_x, old_y) in self.arrows:
+			if pointer in index and pointer.target is not None:
+				new_x, new_y = self.arrow_end(pointer)
+				pointer.set_arrow(new_x + (old_x - new_x) * rest, new_y + (old_y - new_y) * rest)
+
+	def finish(self):
+		# 立即放完当前这一步：元素落到终点，箭头恢复正常
+		if self.moves is None:
+			return
+		self.progress = 1.0
+		self.render()
+		for pointer, _ in self.arrows:
+			if pointer in self.board.index:
+				pointer.schedule_arrow()
+		self.moves = self.arrows = None
+
+	def flush(self):
+		# 不再动画，把排队的步骤全部直接做完（保存、撤销、自动布局前）
+		self.finish()
+		while self.steps:
+			if self.begin(*self.steps.popleft()):
+				self.finish()
+		self.board.layout.flush()
+		self.board.arrow_router.flush()
+
+	def cancel(self):
+		self.steps.clear()
+		self.finish()
+		if self.timer is not None:
+			self.board.canvas.after_cancel(self.timer)
+			self.timer = None
+
+
+class NullCanvas:
+	# 无界面渲染器：接口与 tk.Canvas 中元素用到的部分一致但不画任何东西，
+	# 用于没有显示器的批处理、格式转换与基准测试
+	def __init__(self):
+		self.next_id = 0
+		self.idle = {}
+
+	def _create(self, *args, **kwargs):
+		self.next_id += 1
+		return self.next_id
+	create_rectangle = create_oval = create_text = create_line = create_polygon = _create
+
+	def coords(self, *args):
+		return []
+
+	def _ignore(self, *args, **kwargs):
+		pass
+	move = delete = itemconfig = itemconfigure = tag_raise = tag_lower = lift = lower = _ignore
+	addtag_withtag = dtag = _ignore
+
+	def find_withtag(self, tag):
+		return ()
+
+	def after_idle(self, func, *args):
+		self.next_id += 1
+		token = f'idle#{self.next_id}'
+		self.idle[token] = (func, args)
+		return token
+
+	def after(self, ms, func, *args):
+		# 没有事件循环，定时任务与空闲任务一样在 update_idletasks 时执行
+		return self.after_idle(func, *args)
+
+	def after_cancel(self, token):
+		self.idle.pop(token, None)
+
+	def update_idletasks(self):
+		while self.idle:
+			token = next(iter(self.idle))
+			func, args = self.idle.pop(token)
+			func(*args)
+
+
+class SvgCanvas(NullCanvas):
+	# 记录图元的无界面画布：元素照常调用 draw() / update_arrow()，几何与窗口里完全一致，
+	# 最后按叠放顺序把记录下来的图元写成 SVG 或 PDF
+	def __init__(self):
+		super().__init__()
+		self.items = {}		# id -> [类型, 坐标, 选项, 标签]，字典顺序即叠放顺序
+		self.tags = {}
+
+	def _add(self, kind, coords, options):
+		if len(coords) == 1:
+			coords = coords[0]
+		self.next_id += 1
+		item = self.next_id
+		tags = options.pop('tags', ())
+		self.items[item] = [kind, [float(v) for v in coords], options]
+		self._tag(item, (tags,) if isinstance(tags, str) else tags)
+		return item
+
+	def create_rectangle(self, *coords, **options):
+		return self._add('rectangle', coords, options)
+
+	def create_oval(self, *coords, **options):
+		return self._add('oval', coords, options)
+
+	def create_line(self, *coords, **options):
+		return self._add('line', coords, options)
+
+	def create_polygon(self, *coords, **options):
+		return self._add('polygon', coords, options)
+
+	def create_text(self, *coords, **options):
+		return self._add('text', coords, options)
+
+	def _tag(self, item, tags):
+		for tag in tags:
+			self.tags.setdefault(tag, set()).add(item)
+		self.items[item].append(tuple(tags))
+
+	def _untag(self, item):
+		for tag in self.items[item].pop():
+			found = self.tags.get(tag)
+			if found is not None:
+				found.discard(item)
+				if not found:
+					del self.tags[tag]
+
+	def _find(self, tag):
+		if isinstance(tag, int):
+			return [tag] if tag in self.items else []
+		found = self.tags.get(tag)
+		if not found:
+			return []
+		return [item for item in self.items if item in found]
+
+	def coords(self, tag, *coords):
+		found = self._find(tag)
+		if not found:
+			return []
+		item = self.items[found[0]]
+		if coords:
+			if len(coords) == 1:
+				coords = coords[0]
+			item[1] = [float(v) for v in coords]
+		return list(item[1])
+
+	def move(self, tag, dx, dy):
+		for item in self._find(tag):
+			coords = self.items[item][1]
+			for i in range(0, len(coords), 2):
+				coords[i] += dx
+				coords[i + 1] += dy
+
+	def delete(self, *tags):
+		for tag in tags:
+			for item in self._find(tag):
+				self._untag(item)
+				del self.items[item]
+
+	def itemconfigure(self, tag, cnf=None, **options):
+		options.update(cnf or {})
+		tags = options.pop('tags', None)
+		for item in self._find(tag):
+			if tags is not None:
+				self._untag(item)
+				self._tag(item, (tags,) if isinstance(tags, str) else tags)
+			self.items[item][2].update(options)
+	itemconfig = itemconfigure
+
+	def tag_raise(self, tag, above=None):
+		for item in self._find(tag):
+			self.items[item] = self.items.pop(item)
+	lift = tag_raise
+
+	def tag_lower(self, tag, below=None):
+		found = self._find(tag)
+		rest = {item: data for item, data in self.items.items() if item not in found}
+		self.items = {item: self.items[item] for item in found}
+		self.items.update(rest)
+	lower = tag_lower
+
+	def find_withtag(self, tag):
+		return tuple(self._find(tag))
+
+	def addtag_withtag(self, newtag, tag):
+		for item in self._find(tag):
+			tags = self.items[item][3]
+			if newtag not in tags:
+				self._untag(item)
+				self._tag(item, tags + (newtag,))
+
+	def dtag(self, tag, todel=None):
+		todel = tag if todel is None else todel
+		for item in self._find(tag):
+			tags = self.items[item][3]
+			if todel in tags:
+				self._untag(item)
+				self._tag(item, tuple(t for t in tags if t != todel))
+
+	def shapes(self):
+		# 按叠放顺序给出每个图元的几何与样式，箭头线换算成线段加箭头多边形（与 Tk 的 arrowshape 一致）
+		for kind, coords, options, _ in self.items.values():
+			if options.get('state') == 'hidden':
+				continue
+			if kind == 'line' and options.get('arrow') == 'last' and len(coords) >= 4:
+				head, neck = _arrowhead(coords[-4:], float(options.get('width', 1)))
+				yield 'line', coords[:-2] + list(neck), options
+				yield 'polygon', head, {'fill': options.get('fill', 'black')}
+			else:
+				yield kind, coords, options
+
+	def bbox(self, margin=20):
+		xs = []
+		ys = []
+		for kind, coords, options in self.shapes():
+			if kind == 'text':
+				width, height = _text_extent(options)
+				xs += [coords[0], coords[0] + width]
+				ys += [coords[1], coords[1] + height]
+			else:
+				xs += coords[0::2]
+				ys += coords[1::2]
+		if not xs:
+			return 0, 0, 2 * margin, 2 * margin
+		return min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin
+
+	def to_svg(self, margin=20):
+		x1, y1, x2, y2 = self.bbox(margin)
+		out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{x2 - x1:g}" height="{y2 - y1:g}" '
+			f'viewBox="{x1:g} {y1:g} {x2 - x1:g} {y2 - y1:g}">',
+			f'<rect x="{x1:g}" y="{y1:g}" width="{x2 - x1:g}" height="{y2 - y1:g}" fill="{COLORS["background"]}"/>']
+		for kind, coords, options in self.shapes():
+			fill = options.get('fill', 'black' if kind in ('line', 'text', 'polygon') else '') or 'none'
+			outline = options.get('outline', 'black' if kind in ('rectangle', 'oval') else '') or 'none'
+			width = options.get('width', 1)
+			if kind == 'rectangle':
+				x, y, right, bottom = coords
+				out.append(f'<rect x="{x:g}" y="{y:g}" width="{right - x:g}" height="{bottom - y:g}" '
+					f'fill="{fill}" stroke="{outline}" stroke-width="{width}"/>')
+			elif kind == 'oval':
+				x, y, right, bottom = coords
+				out.append(f'<ellipse cx="{(x + right) / 2:g}" cy="{(y + bottom) / 2:g}" '
+					f'rx="{(right - x) / 2:g}" ry="{(bottom - y) / 2:g}" '
+					f'fill="{fill}" stroke="{outline}" stroke-width="{width}"/>')
+			elif kind == 'line':
+				points = ' '.join(f'{v:g}' for v in coords)
+				out.append(f'<polyline points="{points}" fill="none" stroke="{fill}" stroke-width="{width}"/>')
+			elif kind == 'polygon':
+				points = ' '.join(f'{v:g}' for v in coords)
+				out.append(f'<polygon points="{points}" fill="{fill}" stroke="{outline}"/>')
+			elif kind == 'text':
+				family, size = _font(options)
+				x, y = coords[:2]
+				out.append(f'<text font-family="{html.escape(family)}" font-size="{size:g}" fill="{fill}">')
+				for i, line in enumerate(str(options.get('text', '')).split('\n')):
+					out.append(f'<tspan x="{x:g}" y="{y + size * (0.9 + 1.2 * i):g}">{html.escape(line)}</tspan>')
+				out.append('</text>')
+		out.append('</svg>')
+		return '\n'.join(out) + '\n'
+
+	def to_pdf(self, margin=20):
+		# 不依赖第三方库的单页 PDF：矢量图形加标准 Helvetica 字体（只覆盖 Latin-1 字符）
+		x1, y1, x2, y2 = self.bbox(margin)
+		height = y2 - y1
+		ops = [f'{_pdf_color(COLORS["background"])} rg 0 0 {x2 - x1:.2f} {height:.2f} re f']
+
+		def pt(x, y):
+			return f'{x - x1:.2f} {height - (y - y1):.2f}'
+
+		for kind, coords, options in self.shapes():
+			fill = options.get('fill', 'black' if kind in ('line', 'text', 'polygon') else '')
+			outline = options.get('outline', 'black' if kind in ('rectangle', 'oval') else '')
+			paint = ('B' if outline else 'f') if fill else ('S' if outline else 'n')
+			style = (f'{_pdf_color(fill)} rg ' if fill else '') + (f'{_pdf_color(outline)} RG ' if outline else '')
+			width = float(options.get('width', 1))
+			if kind == 'rectangle':
+				x, y, right, bottom = coords
+				ops.append(f'{style}{width:g} w {pt(x, bottom)} {right - x:.2f} {bottom - y:.2f} re {paint}')
+			elif kind == 'oval':
+				x, y, right, bottom = coords
+				cx, cy, rx, ry = (x + right) / 2, (y + bottom) / 2, (right - x) / 2, (bottom - y) / 2
+				k = 0.5523
+				path = [f'{pt(cx + rx, cy)} m',
+					f'{pt(cx + rx, cy + k * ry)} {pt(cx + k * rx, cy + ry)} {pt(cx, cy + ry)} c',
+					f'{pt(cx - k * rx, cy + ry)} {pt(cx - rx, cy + k * ry)} {pt(cx - rx, cy)} c',
+					f'{pt(cx - rx, cy - k * ry)} {pt(cx - k * rx, cy - ry)} {pt(cx, cy - ry)} c',
+					f'{pt(cx + k * rx, cy - ry)} {pt(cx + rx, cy - k * ry)} {pt(cx + rx, cy)} c']
+				ops.append(f'{style}{width:g} w ' + ' '.join(path) + f' {paint}')
+			elif kind == 'line':
+				path = [f'{pt(coords[0], coords[1])} m'] + [f'{pt(coords[i], coords[i + 1])} l'
+					for i in range(2, len(coords), 2)]
+				ops.append(f'{_pdf_color(fill)} RG {width:g} w ' + ' '.join(path) + ' S')
+			elif kind == 'polygon':
+				path = [f'{pt(coords[0], coords[1])} m'] + [f'{pt(coords[i], coords[i + 1])} l'
+					for i in range(2, len(coords), 2)]
+				ops.append(f'{_pdf_color(fill)} rg ' + ' '.join(path) + ' h f')
+			elif kind == 'text':
+				_, size = _font(options)
+				x, y = coords[:2]
+				for i, line in enumerate(str(options.get('text', '')).split('\n')):
+					text = line.encode('latin-1', 'replace').replace(b'\\', b'\\\\')
+					text = text.replace(b'(', b'\\(').replace(b')', b'\\)').decode('latin-1')
+					ops.append(f'BT {_pdf_color(fill)} rg /F1 {size:g} Tf {pt(x, y + size * (0.9 + 1.2 * i))} Td ({text}) Tj ET')
+		content = zlib.compress('\n'.join(ops).encode('latin-1'))
+		objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+			b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+			f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {x2 - x1:.2f} {height:.2f}] '
+			f'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>'.encode(),
+			b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+			b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream']
+		out = bytearray(b'%PDF-1.4\n')
+		offsets = []
+		for i, body in enumerate(objects, 1):
+			offsets.append(len(out))
+			out += b'%d 0 obj\n' % i + body + b'\nendobj\n'
+		xref = len(out)
+		out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+		for offset in offsets:
+			out += b'%010d 00000 n \n' % offset
+		out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+		return bytes(out)
+
+
+_NAMED_COLORS = {'black': '#000000', 'white': '#FFFFFF', 'red': '#FF0000'}
+
+
+def _pdf_color(color):
+	color = _NAMED_COLORS.get(color, color)
+	return ' '.join(f'{int(color[i:i + 2], 16) / 255:.3f}' for i in (1, 3, 5))
+
+
+def _font(options):
+	# Tk 的字号是磅，换算成 96 dpi 下的像素
+	font = options.get('font', ('Arial', 10))
+	return font[0], abs(font[1]) * 96 / 72
+
+
+def _text_extent(options):
+	_, size = _font(options)
+	lines = str(options.get('text', '')).split('\n')
+	return max(len(line) for line in lines) * size * 0.6, len(lines) * size * 1.2
+
+
+def _arrowhead(coords, width, shape=(8, 10, 3)):
+	# Tk 默认 arrowshape：箭尖到颈部 8，到两翼 10，两翼超出线宽 3；线段画到颈部为止
+	x1, y1, x2, y2 = coords
+	length = math.hypot(x2 - x1, y2 - y1) or 1.0
+	ux, uy = (x2 - x1) / length, (y2 - y1) / length
+	a, b, c = shape
+	side = width / 2 + c
+	neck = (x2 - a * ux, y2 - a * uy)
+	head = [x2, y2,
+		x2 - b * ux - side * uy, y2 - b * uy + side * ux,
+		neck[0], neck[1],
+		x2 - b * ux + side * uy, y2 - b * uy - side * ux]
+	return head, neck
+
+
+EXPORT_FORMATS = ('svg', 'png', 'pdf')
+
+
+def render_board(board, fmt='svg'):
+	# 画板渲染成 SVG 文本或 PNG / PDF 字节。PNG 需要 cairosvg 或本机的 rsvg-convert；
+	# PDF 优先用它们，都没有时用内置的写出器
+	svg_canvas = SvgCanvas()
+	export = Board(svg_canvas)
+	if board.elements:
+		board.flush()
+		x = min(elem.x for elem in board.elements)
+		y = min(elem.y for elem in board.elements)
+		export.paste(board.copy_records(board.elements), x, y)
+	export.flush()
+	return render_canvas(svg_canvas, fmt)
+
+
+def render_canvas(svg_canvas, fmt='svg'):
+	if fmt not in EXPORT_FORMATS:
+		raise ValueError(f"unknown export format: {fmt!r}")
+	svg = svg_canvas.to_svg()
+	if fmt == 'svg':
+		return svg
+	if cairosvg is not None:
+		return getattr(cairosvg, 'svg2' + fmt)(bytestring=svg.encode('utf-8'))
+	tool = shutil.which('rsvg-convert')
+	if tool is not None:
+		return subprocess.run([tool, '-f', fmt], input=svg.encode('utf-8'),
+			stdout=subprocess.PIPE, check=True).stdout
+	if fmt == 'pdf':
+		return svg_canvas.to_pdf()
+	raise RuntimeError("PNG export needs the cairosvg package or the rsvg-convert program")
+
+
+def export_board(src, dst, fmt=None):
+	# 存档文件（JSON 或二进制）直接读进记录画布再导出，不经过窗口
+	fmt = fmt or os.path.splitext(dst)[1][1:].lower()
+	if fmt not in EXPORT_FORMATS:
+		raise ValueError(f"unknown export format: {fmt!r}")
+	svg_canvas = SvgCanvas()
+	board = Board(svg_canvas)
+	board.load_from_file(src)
+	board.flush()
+	write_export(dst, render_canvas(svg_canvas, fmt))
+	return dst
+
+
+def write_export(dst, data):
+	if isinstance(data, str):
+		with open(dst, 'w', encoding='utf-8') as f:
+			f.write(data)
+	else:
+		with open(dst, 'wb') as f:
+			f.write(data)
+
+
+def _export_job(job):
+	# 进程池里的任务：返回 (源文件, 错误信息)，一个文件失败不影响其余文件
+	src, dst, fmt = job
+	try:
+		export_board(src, dst, fmt)
+	except (OSError, ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+		return src, f"{type(e).__name__}: {e}"
+	return src, None
+
+
+def export_boards(sources, outdir=None, fmt='svg', jobs=None):
+	# 批量导出：目录展开为其中的 .json / .dsb 文件，用进程池并行转换，按块分发减少进程间往返
+	files = []
+	for source in sources:
+		if os.path.isdir(source):
+			files += sorted(entry.path for entry in os.scandir(source)
+				if entry.is_file() and entry.name.endswith(('.json', BINARY_EXTENSION)))
+		else:
+			files.append(source)
+	if outdir is not None:
+		os.makedirs(outdir, exist_ok=True)
+	tasks = [(src, os.path.join(outdir if outdir is not None else os.path.dirname(src),
+		os.path.splitext(os.path.basename(src))[0] + '.' + fmt), fmt) for src in files]
+	jobs = jobs or os.cpu_count() or 1
+	if jobs == 1 or len(tasks) <= 1:
+		return [_export_job(task) for task in tasks]
+	with ProcessPoolExecutor(jobs) as pool:
+		return list(pool.map(_export_job, tasks, chunksize=max(1, len(tasks) // (jobs * 8))))
+
+
+class ViewCanvas(tk.Canvas if tk is not None else object):
+	# 可缩放画布：元素一律用世界坐标调用绘制接口，这里按缩放倍数换算成画布坐标。
+	# 缩放时只对现有图元做一次 scale()，不重建任何元素；字体按缩放级别缓存
+	ZOOM_STEP = 1.25
+	MIN_LEVEL, MAX_LEVEL = -12, 8
+
+	def __init__(self, master=None, **kwargs):
+		super().__init__(master, **kwargs)
+		self.level = 0
+		self.zoom = 1.0
+		self.fonts = {}
+		self.text_fonts = {}
+
+	def font(self, spec):
+		key = (spec, self.level)
+		font = self.fonts.get(key)
+		if font is None:
+			font = self.fonts[key] = (spec[0], max(1, round(spec[1] * self.zoom))) + tuple(spec[2:])
+		return font
+
+	def _scaled(self, coords):
+		if len(coords) == 1:
+			coords = coords[0]
+		return [c * self.zoom for c in coords]
+
+	def create_rectangle(self, *coords, **kwargs):
+		return super().create_rectangle(*self._scaled(coords), **kwargs)
+
+	def create_oval(self, *coords, **kwargs):
+		return super().create_oval(*self._scaled(coords), **kwargs)
+
+	def create_line(self, *coords, **kwargs):
+		return super().create_line(*self._scaled(coords), **kwargs)
+
+	def create_polygon(self, *coords, **kwargs):
+		return super().create_polygon(*self._scaled(coords), **kwargs)
+
+	def create_text(self, *coords, **kwargs):
+		spec = kwargs.get('font')
+		if spec is not None:
+			kwargs['font'] = self.font(spec)
+		item = super().create_text(*self._scaled(coords), **kwargs)
+		if spec is not None:
+			self.text_fonts[item] = spec
+		return item
+
+	def itemconfigure(self, item, cnf=None, **kwargs):
+		if 'font' in kwargs:
+			self.text_fonts[item] = kwargs['font']
+			kwargs['font'] = self.font(kwargs['font'])
+		return super().itemconfigure(item, cnf, **kwargs)
+	itemconfig = itemconfigure
+
+	def coords(self, item, *coords):
+		if coords:
+			return super().coords(item, *self._scaled(coords))
+		return [c / self.zoom for c in super().coords(item)]
+
+	def move(self, item, dx, dy):
+		super().move(item, dx * self.zoom, dy * self.zoom)
+
+	def delete(self, *items):
+		for item in items:
+			self.text_fonts.pop(item, None)
+		super().delete(*items)
+
+	def canvasx(self, screenx, gridspacing=None):
+		# 窗口坐标 -> 世界坐标
+		return super().canvasx(screenx) / self.zoom
+
+	def canvasy(self, screeny, gridspacing=None):
+		return super().canvasy(screeny) / self.zoom
+
+	def set_level(self, level):
+		level = max(self.MIN_LEVEL, min(self.MAX_LEVEL, level))
+		if level == self.level:
+			return False
+		zoom = self.ZOOM_STEP ** level
+		factor = zoom / self.zoom
+		self.level = level
+		self.zoom = zoom
+		self.scale('all', 0, 0, factor, factor)
+		for item, spec in self.text_fonts.items():
+			super().itemconfigure(item, font=self.font(spec))
+		return True
+
+
+class Board:
+	# 画板模型：顶层元素、空间索引、布局、箭头、变动通知与撤销历史，不依赖窗口。
+	# 绘制交给传入的画布：窗口里是 tk.Canvas，批处理时默认用 NullCanvas
+	def __init__(self, canvas=None):
+		self.canvas = canvas if canvas is not None else NullCanvas()
+		self.elements = []
+		self.index = SpatialIndex()
+		self.arrow_router = ArrowRouter(self.canvas)
+		self.edges = EdgeIndex()
+		self.layout = LayoutEngine(self.canvas)
+		self.changes = ChangeFeed()
+		self.history = History(self)
+		self.changes.listeners.append(self.history.record)
+		self.reachability = Reachability(self)
+		self.auto_layout = AutoLayout(self)
+		self.animator = Animator(self)
+		self.selection = Selection(self)
+		self.canvas.board = self
+		self.canvas.spatial_index = self.index
+		self.canvas.arrow_router = self.arrow_router
+		self.canvas.edges = self.edges
+		self.canvas.layout = self.layout
+		self.canvas.changes = self.changes
+		self.canvas.selection = self.selection
+
+	def batch(self):
+		# with board.batch(): 批量编辑期间只在结束时布局、画箭头一次
+		return self.layout.batch()
+
+	def flush(self):
+		# 立即完成延迟的布局、箭头与进行中的动画，之后元素坐标都是最新的
+		self.animator.finish()
+		self.layout.flush()
+		self.arrow_router.flush()
+
+	def get_all_elements(self):
+		all_elements = []
+		for elem in self.elements:
+			all_elements.append(elem)
+			if isinstance(elem, Volume):
+				all_elements.extend(elem.elements)
+		return all_elements
+
+	def add_new(self, elem):
+		self.elements.append(elem)
+		elem.emit('create')
+		return elem
+
+	def pop(self, volume):
+		# 栈/队列弹出一个元素，放到容器右侧成为顶层元素
+		popped = volume.remove_element()
+		if popped:
+			old_x, old_y = popped.x, popped.y
+			popped.x = volume.x + volume.width + 20
+			popped.y = volume.y
+			self.elements.append(popped)
+			popped.draw()
+			popped.update_arrows()
+			popped.emit('move', dx=popped.x - old_x, dy=popped.y - old_y)
+		return popped
+
+	def clear(self):
+		self.auto_layout.cancel()
+		self.animator.cancel()
+		self.selection.clear()
+		elements, self.elements = self.elements, []
+		for elem in elements:
+			elem.delete()
+		self.index.clear()
+		self.edges.clear()
+
+	def save_to_file(self, filename, compact=False):
+		self.flush()
+		records, parents = board_records(self.elements)
+		if is_binary_board(filename):
+			with open(filename, 'wb') as f:
+				write_binary_board(f, records, parents)
+		else:
+			with open(filename, 'w') as f:
+				write_board_json(f, records, parents, indent=None if compact else 2)
+
+	def load_from_file(self, filename, progress=None):
+		with open(filename, 'rb') as f:
+			if is_binary_board(filename):
+				records, parents = read_binary_records(f)
+			else:
+				records, parents = read_board_records(f, progress)
+		keep, targets = resolve_board_records(records, parents)
+
+		self.clear()
+		created = {}
+		with self.changes.mute(), self.batch():
+			# 按先序创建，父容器总在子元素之前；布局与箭头在批量结束时统一完成一次
+			for i in keep:
+				rec = records[i]
+				elem = ELEMENT_CLASSES[rec['type']].from_dict(rec, self.canvas)
+				created[i] = elem
+				if parents[i] is None:
+					self.elements.append(elem)
+				else:
+					created[parents[i]].add_element(elem)
+				if isinstance(elem, Volume):
+					self.layout.mark(elem)
+			for i, j in targets.items():
+				created[i].create_arrow(created[j])
+		self.history.clear()
+		self.reachability.invalidate()
+
+	# ---- 脚本接口：用代码批量建板。生成器都在 batch() 里完成，布局与箭头在结束时统一做一次 ----
+
+	def attach(self, elem, parent=None):
+		# 新元素先发创建通知，再挂到顶层或父容器下（与界面上先创建、再拖入容器的顺序一致）
+		if parent is None:
+			self.elements.append(elem)
+			elem.emit('create')
+		else:
+			elem.emit('create')
+			parent.add_element(elem)
+		return elem
+
+	# ---- 复制与粘贴 ----
+
+	def copy_records(self, elements):
+		# 剪贴板内容：与存档相同的先序扁平记录（去掉 uuid）、父记录下标和指针目标。
+		# 目标在复制范围内时记下标，粘贴后改指新副本；范围外的仍指原来的元素
+		nodes = []
+		records, parents = board_records(elements, nodes)
+		position = {elem: i for i, elem in enumerate(nodes)}
+		targets = {}
+		for i, (rec, elem) in enumerate(zip(records, nodes)):
+			rec['uuid'] = None
+			rec.pop('parent_uuid', None)
+			target = rec.pop('target_uuid', None) and elem.target
+			if target is not None:
+				targets[i] = position.get(target, target)
+		return records, parents, targets
+
+	def paste(self, clip, x=None, y=None):
+		# 按剪贴板记录一次性建出副本：左上角放到 (x, y)，不给位置时在原处右下方 20 像素。
+		# 整个子树在一个批量里创建，布局与箭头在结束时统一做一次
+		records, parents, targets = clip
+		dx = dy = 20
+		if x is not None:
+			tops = [rec for rec, parent in zip(records, parents) if parent is None]
+			dx = x - min(rec['x'] for rec in tops)
+			dy = y - min(rec['y'] for rec in tops)
+		created = []
+		with self.batch():
+			for rec, parent in zip(records, parents):
+				rec = dict(rec, x=rec['x'] + dx, y=rec['y'] + dy)
+				elem = ELEMENT_CLASSES[rec['type']].from_dict(rec, self.canvas)
+				created.append(elem)
+				self.attach(elem, None if parent is None else created[parent])
+			for i, target in targets.items():
+				if type(target) is int:
+					target = created[target]
+				elif target not in self.index:
+					continue
+				created[i].create_arrow(target)
+		return [elem for elem, parent in zip(created, parents) if parent is None]
+
+	def clone(self, elements):
+		return self.paste(self.copy_records(elements))
+
+	def data_cell(self, value="", name="Data", x=0, y=0, parent=None):
+		return self.attach(DataCell(self.canvas, x, y, name, str(value)), parent)
+
+	def pointer(self, target=None, name="Pointer", x=0, y=0, parent=None):
+		pointer = self.attach(PointerCell(self.canvas, x, y, name), parent)
+		if target is not None:
+			pointer.create_arrow(target)
+		return pointer
+
+	def struct(self, name="Struct", x=0, y=0, parent=None):
+		return self.attach(StructBlock(self.canvas, x, y, name), parent)
+
+	def stack(self, values=(), name="Stack", x=0, y=0, is_stack=True):
+		with self.batch():
+			container = self.attach(StackQueue(self.canvas, x, y, name, is_stack))
+			for value in values:
+				self.data_cell(value, parent=container)
+		return container
+
+	def queue(self, values=(), name="Queue", x=0, y=0):
+		return self.stack(values, name, x, y, is_stack=False)
+
+	def connect(self, pointer, target):
+		pointer.create_arrow(target)
+
+	def node(self, value, fields=('next',), name="Node", x=0, y=0):
+		# 一个结构体节点：值单元加上若干指针字段；返回 (节点, {字段名: 指针})。
+		# 子元素直接建在各自的槽位上，布局时不必再移动
+		node = self.struct(name, x, y)
+		self.data_cell(value, "Value", *node.slot(0), parent=node)
+		ptrs = {}
+		for i, field in enumerate(fields, 1):
+			ptrs[field] = self.pointer(name=field, x=node.slot(i)[0], y=node.y + 40, parent=node)
+		node.measure()
+		return node, ptrs
+
+	def arrange(self, objects, x=100, y=100, method='auto'):
+		# 只对给定的顶层对象按指针关系排布，左上角对齐到 (x, y)
+		if not objects:
+			return
+		self.layout.flush()
+		sizes = [(obj.width, obj.height) for obj in objects]
+		_, targets = compute_layout(sizes, [(x, y)], pointer_graph(objects), method)
+		for obj, (tx, ty) in zip(objects, targets):
+			obj.move(tx - obj.x, ty - obj.y)
+
+	def linked_list(self, values, x=100, y=100, doubly=False, per_row=16):
+		# 单/双向链表，节点按行排开（每行 per_row 个）；另建一个 head 指针指向第一个节点。返回节点列表
+		fields = ('prev', 'next') if doubly else ('next',)
+		with self.batch():
+			head = self.pointer(None, "head", x, y)
+			top = y + head.height + LAYOUT_GAP_Y
+			left = x
+			row_height = 0
+			nodes = []
+			# 节点直接建在最终位置上，省掉建好后再整体平移
+			for i, value in enumerate(values):
+				if i and i % per_row == 0:
+					top += row_height + LAYOUT_GAP_Y
+					left = x
+					row_height = 0
+				node, ptrs = self.node(value, fields, x=left, y=top)
+				left += node.width + LAYOUT_GAP_X
+				row_height = max(row_height, node.height)
+				nodes.append((node, ptrs))
+			for (node, ptrs), (succ, succ_ptrs) in zip(nodes, nodes[1:]):
+				ptrs['next'].create_arrow(succ)
+				if doubly:
+					succ_ptrs['prev'].create_arrow(node)
+			if nodes:
+				head.create_arrow(nodes[0][0])
+		return [node for node, _ in nodes]
+
+	def binary_tree(self, values, x=100, y=100):
+		# 按层序给出的二叉树（None 表示空位，与常见题目的数组表示一致），返回根节点
+		values = list(values)
+		if not values or values[0] is None:
+			return None
+		with self.batch():
+			root, root_ptrs = self.node(values[0], ('left', 'right'))
+			objects = [root]
+			pending = deque([root_ptrs])
+			i = 1
+			while pending and i < len(values):
+				ptrs = pending.popleft()
+				for field in ('left', 'right'):
+					if i < len(values) and values[i] is not None:
+						child, child_ptrs = self.node(values[i], ('left', 'right'))
+						ptrs[field].create_arrow(child)
+						objects.append(child)
+						pending.append(child_ptrs)
+					i += 1
+			self.arrange(objects, x, y, 'tree')
+		return root
+
+	def graph(self, adjacency, x=100, y=100, method='auto'):
+		# 邻接表 {名字: [邻居, ...]}：每个顶点是一个结构体，每条出边一个指针。返回 {名字: 节点}
+		if not isinstance(adjacency, dict):
+			raise TypeError("graph adjacency must be an object {name: [neighbors, ...]}")
+		with self.batch():
+			nodes = {}
+			for name, neighbors in adjacency.items():
+				for key in (name, *neighbors):
+					if key not in nodes:
+						nodes[key] = self.struct(str(key))
+						self.data_cell(key, "Value", parent=nodes[key])
+			for name, neighbors in adjacency.items():
+				for neighbor in neighbors:
+					self.pointer(nodes[neighbor], str(neighbor), parent=nodes[name])
+			self.arrange(list(nodes.values()), x, y, method)
+		return nodes
+
+	def hash_table(self, items, buckets=8, x=100, y=100):
+		# 拉链法散列表：表是一个结构体，每个桶一个指针，指向由 next 串起来的节点链。返回表
+		items = items.items() if isinstance(items, dict) else items
+		with self.batch():
+			table = self.struct("Table")
+			heads = [self.pointer(name=f"[{i}]", parent=table) for i in range(buckets)]
+			tails = list(heads)
+			objects = [table]
+			for key, value in items:
+				bucket = zlib.crc32(str(key).encode('utf-8')) % buckets
+				node, ptrs = self.node(f"{key}: {value}")
+				tails[bucket].create_arrow(node)
+				tails[bucket] = ptrs['next']
+				objects.append(node)
+			self.arrange(objects, x, y, 'tree')
+		return table
+
+	def build(self, spec):
+		# 按描述建板：spec 是一项或一组 {"type": ..., ...}，字段与上面各方法的参数同名
+		items = spec if isinstance(spec, list) else [spec]
+		builders = {
+			'linked_list': self.linked_list, 'binary_tree': self.binary_tree,
+			'graph': self.graph, 'hash_table': self.hash_table,
+			'stack': self.stack, 'queue': self.queue,
+		}
+		built = []
+		with self.batch():
+			for i, item in enumerate(items):
+				if not isinstance(item, dict):
+					raise ValueError(f"item #{i} must be an object with a \"type\" field")
+				item = dict(item)
+				kind = item.pop('type', None)
+				if kind not in builders:
+					raise ValueError(f"unknown structure type: {kind!r}")
+				built.append(builders[kind](**item))
+		return built
+
+
+SHIFT_MASK = 0x0001		# 事件 state 中的 Shift 位
+AUTOSAVE_DIR = os.path.join(os.path.expanduser('~'), '.datastructure_canvas', 'autosave')
+
+
+class DataStructureCanvas:
+	DRAG_FRAME_MS = 16	# 拖动时每帧最多真正移动一次（约 60 Hz）
+
+	def __init__(self, root, autosave_dir=AUTOSAVE_DIR):
+		self.root = root
+		self.root.title("Data Structure Whiteboard")
+		self.root.geometry("1200x800")
+		
+		view = ttk.Frame(root)
+		view.pack(fill=tk.BOTH, expand=True)
+		self.canvas = ViewCanvas(view, bg=COLORS['background'])
+		xbar = ttk.Scrollbar(view, orient=tk.HORIZONTAL, command=self.xview)
+		ybar = ttk.Scrollbar(view, orient=tk.VERTICAL, command=self.yview)
+		self.canvas.configure(xscrollcommand=xbar.set, yscrollcommand=ybar.set)
+		self.canvas.grid(row=0, column=0, sticky='nsew')
+		ybar.grid(row=0, column=1, sticky='ns')
+		xbar.grid(row=1, column=0, sticky='ew')
+		view.rowconfigure(0, weight=1)
+		view.columnconfigure(0, weight=1)
+		self.board = Board(self.canvas)
+		self.index = self.board.index
+		self.arrow_router = self.board.arrow_router
+		self.edges = self.board.edges
+		self.layout = self.board.layout
+		self.changes = self.board.changes
+		self.history = self.board.history
+		self.viewport = Viewport(self.canvas, self.index)
+		self.canvas.viewport = self.viewport
+		
+		self.selected_element = None
+		self.drag_start = None
+		self.drag_delta = (0, 0)
+		self.drag_pending = None
+		self.outline_drag = False
+		self.proxy = None
+		self.proxy_delta = (0, 0)
 		self.clipboard = None
 		self.dragging_pointer = False
 		self.right_click_pos = (0, 0)
+		self.band_start = None
+		self.band = None
 		
 		self.setup_bindings()
 		self.create_context_menu()
 		self.create_control_panel()
 		self.show_grid = False
 		self.grid_lines = []
+		self.grid_shown = 0
+
+		self.canvas.bind("<Configure>", self.on_configure)  # 绑定画布大小改变事件
+
+		self.journal = None
+		if autosave_dir:
+			self.journal = Journal(autosave_dir, self.board)
+			self.changes.listeners.append(self.journal.record)
+			self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+			self.root.after_idle(self.recover_autosave)
+			self.root.after(60000, self.autosave_tick)
+
+	def recover_autosave(self):
+		found = self.journal.recover()
+		if found:
+			snapshot, entries = found
+			if (entries or os.path.getsize(snapshot) > 2) and messagebox.askyesno(
+					"Recover", "Recover the board from the last session?"):
+				self.board.load_from_file(snapshot)
+				with self.changes.mute(), self.batch():
+					replay_journal(self.board, entries)
+				self.journal.rebase(snapshot, entries)
+				return
+		self.journal.checkpoint()
+
+	def autosave_tick(self):
+		if self.journal.count:
+			self.journal.checkpoint()
+		self.root.after(60000, self.autosave_tick)
 
-		self.canvas.bind("<Configure>", self.draw_grid)  # 绑定画布大小改变事件
+	def on_close(self):
+		self.journal.checkpoint()
+		self.journal.close()
+		self.root.destroy()
 		
-	def draw_grid(self, event=None):
-		# 先删除旧网格
-		for line in self.grid_lines:
-			self.canvas.delete(line)
-		self.grid_lines.clear()
+	def on_configure(self, event=None):
+		self.view_changed()
+
+	def view_changed(self):
+		# 滚动、平移、缩放或窗口大小变化后：网格只重排可见部分，元素按视口重新裁剪
+		self.viewport.rect = self.viewport.visible_rect()
+		self.draw_grid()
+		self.viewport.schedule()
+
+	def xview(self, *args):
+		self.canvas.xview(*args)
+		self.view_changed()
+
+	def yview(self, *args):
+		self.canvas.yview(*args)
+		self.view_changed()
 
-		if not self.show_grid:
+	def on_wheel(self, event):
+		# 滚轮上下滚动，按住 Shift 左右滚动
+		step = -3 if event.num == 4 or event.delta > 0 else 3
+		if event.state & 0x1:
+			self.canvas.xview_scroll(step, 'units')
+		else:
+			self.canvas.yview_scroll(step, 'units')
+		self.view_changed()
+
+	def on_zoom_wheel(self, event):
+		# Ctrl+滚轮以鼠标所在点为中心缩放
+		self.zoom_to(self.canvas.level + (1 if event.num == 4 or event.delta > 0 else -1), event.x, event.y)
+
+	def zoom_to(self, level, sx=None, sy=None):
+		if sx is None:
+			sx = self.canvas.winfo_width() / 2
+			sy = self.canvas.winfo_height() / 2
+		wx, wy = self.canvas.canvasx(sx), self.canvas.canvasy(sy)
+		if not self.canvas.set_level(level):
 			return
+		zoom = self.canvas.zoom
+		left, top = wx - sx / zoom, wy - sy / zoom
+		viewport = self.viewport
+		viewport.scale = zoom
+		viewport.rect = (left, top,
+			left + self.canvas.winfo_width() / zoom, top + self.canvas.winfo_height() / zoom)
+		viewport.update_scrollregion()
+		if viewport.region is not None:
+			# 让鼠标下的那个世界坐标点在缩放后仍停在鼠标下
+			x1, y1, x2, y2 = viewport.region
+			self.canvas.xview_moveto((left - x1) / (x2 - x1))
+			self.canvas.yview_moveto((top - y1) / (y2 - y1))
+		self.view_changed()
 
-		# 绘制新网格
-		width = self.canvas.winfo_width()
-		height = self.canvas.winfo_height()
-		
-		# 绘制垂直网格线
-		for x in range(0, width, 30):
-			line = self.canvas.create_line(x, 0, x, height, fill='#DDDDDD')
-			self.canvas.lower(line)
-			self.grid_lines.append(line)
-		
-		# 绘制水平网格线
-		for y in range(0, height, 30):
-			line = self.canvas.create_line(0, y, width, y, fill='#DDDDDD')
+	def zoom_in(self, event=None):
+		self.zoom_to(self.canvas.level + 1)
+
+	def zoom_out(self, event=None):
+		self.zoom_to(self.canvas.level - 1)
+
+	def zoom_reset(self, event=None):
+		self.zoom_to(0)
+
+	def on_pan_start(self, event):
+		self.canvas.scan_mark(event.x, event.y)
+
+	def on_pan(self, event):
+		self.canvas.scan_dragto(event.x, event.y, gain=1)
+		self.view_changed()
+
+	def point(self, event):
+		# 窗口坐标 -> 画布坐标（画布滚动后两者不同）
+		return self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+
+	def draw_grid(self, event=None):
+		# 网格线条数只取决于可见区域：复用已有线条只改坐标，多出来的隐藏
+		rect = self.viewport.visible_rect() if self.show_grid else None
+		segments = []
+		if rect is not None:
+			x1, y1, x2, y2 = rect
+			step = 30
+			while step * self.viewport.scale < 8:
+				step *= 2	# 缩得太小时隔行画，屏幕上的线距不小于 8 像素
+			x = int(x1 // step) * step
+			while x <= x2:
+				segments.append((x, y1, x, y2))
+				x += step
+			y = int(y1 // step) * step
+			while y <= y2:
+				segments.append((x1, y, x2, y))
+				y += step
+		while len(self.grid_lines) < len(segments):
+			line = self.canvas.create_line(0, 0, 0, 0, fill='#DDDDDD', tags=('grid',))
 			self.canvas.lower(line)
 			self.grid_lines.append(line)
+			self.grid_shown += 1
+		for line, segment in zip(self.grid_lines, segments):
+			self.canvas.coords(line, *segment)
+		if self.grid_shown != len(segments):
+			for i, line in enumerate(self.grid_lines):
+				if (i < len(segments)) != (i < self.grid_shown):
+					self.canvas.itemconfig(line, state='normal' if i < len(segments) else 'hidden')
+			self.grid_shown = len(segments)
 
 	def toggle_grid(self):
 		self.show_grid = not self.show_grid
 		self.draw_grid()		
 		
+	@property
+	def elements(self):
+		return self.board.elements
+
+	def batch(self):
+		return self.board.batch()
+
 	def get_all_elements(self):
-		all_elements = []
-		for elem in self.elements:
-			all_elements.append(elem)
-			if isinstance(elem, Volume):
-				all_elements.extend(elem.elements)
-		return all_elements
+		return self.board.get_all_elements()
 
 	def refresh_all(self):
-		for elem in self.elements:
-			elem.draw()
-		for elem in self.elements:
-			if isinstance(elem, Volume):
-				for child in elem.elements:
-					child.draw()
-		for item in self.canvas.find_all():
-			if self.canvas.type(item) == 'line' and self.canvas.itemcget(item, 'arrow') != 'none':
-				self.canvas.lift(item)
+		# 只重画视口里持有图元的元素；箭头都带 'arrow' 标签，一次提到最上层
+		self.viewport.refresh()
+		with self.batch():
+			for elem in list(self.viewport.live):
+				elem.draw()
+				if isinstance(elem, PointerCell) and elem.target:
+					self.arrow_router.mark(elem)
+		self.canvas.tag_raise('arrow')
 		
 		#self.replace_rectangles()
 
@@ -572,79 +4621,210 @@ class DataStructureCanvas:
 		self.canvas.bind("<ButtonRelease-1>", self.on_release)
 		self.canvas.bind("<Double-Button-1>", self.on_double_click)
 		self.canvas.bind("<Button-3>", self.on_right_click)
+		self.canvas.bind("<MouseWheel>", self.on_wheel)
+		self.canvas.bind("<Button-4>", self.on_wheel)
+		self.canvas.bind("<Button-5>", self.on_wheel)
+		self.canvas.bind("<Control-MouseWheel>", self.on_zoom_wheel)
+		self.canvas.bind("<Control-Button-4>", self.on_zoom_wheel)
+		self.canvas.bind("<Control-Button-5>", self.on_zoom_wheel)
+		self.canvas.bind("<ButtonPress-2>", self.on_pan_start)
+		self.canvas.bind("<B2-Motion>", self.on_pan)
+		self.root.bind("<Control-equal>", self.zoom_in)
+		self.root.bind("<Control-minus>", self.zoom_out)
+		self.root.bind("<Control-0>", self.zoom_reset)
+		self.root.bind("<Control-z>", self.undo)
+		self.root.bind("<Control-y>", self.redo)
+		self.root.bind("<Control-Z>", self.redo)
+		self.root.bind("<Control-c>", self.copy_selection)
+		self.root.bind("<Control-v>", self.paste_element)
+		self.root.bind("<Delete>", self.delete_selection)
 
 	def create_context_menu(self):
 		self.blank_menu = Menu(self.canvas, tearoff=0)
-		self.blank_menu.add_command(label="Paste", command=self.paste_element)
+		self.blank_menu.add_command(label="Paste", command=lambda: self.paste_element(at=self.right_click_pos))
 		self.blank_menu.add_command(label="Clear Canvas", command=self.clear_canvas)
 		
 		self.element_menu = Menu(self.canvas, tearoff=0)
 		self.element_menu.add_command(label="Rename", command=lambda: self.selected_element.rename())
-		self.element_menu.add_command(label="_Copy", command=lambda: self.selected_element.copy())
+		self.element_menu.add_command(label="_Copy", command=self.copy_selection)
 		self.element_menu.add_command(label="Delete", command=lambda: self.selected_element.delete())
 
 	
 
 	def on_click(self, event):
 
-		self.drag_start = (event.x, event.y)
+		self.board.animator.finish()
+		self.history.begin()
+		x, y = self.point(event)
+		self.drag_start = (x, y)
 		if isinstance(self.selected_element, PointerCell):
 			if self.canvas.find_withtag("current") == (self.selected_element.dot,):
 				self.dragging_pointer = True
 				return
 		
-		for elem in reversed(self.get_all_elements()):
-			if elem.contains(event.x, event.y):
-				if self.selected_element:
-					self.selected_element.set_highlight(False)
-				self.selected_element = elem
-				elem.set_highlight(True)
+		elem = self.index.hit(x, y)
+		selection = self.board.selection
+		if event.state & SHIFT_MASK:
+			# Shift+单击增减选中的顶层对象，Shift+空白处拖框追加选择
+			if elem:
+				while elem.parent is not None:
+					elem = elem.parent
+				selection.toggle(elem)
+				self.selected_element = elem if elem in selection else None
+			else:
+				self.band_start = (x, y)
+			return
+		if elem:
+			root = elem
+			while root.parent is not None:
+				root = root.parent
+			if len(selection) > 1 and root in selection:
+				# 按住多选中的任一对象拖动整组
+				self.selected_element = root
 				return
-		
-		if self.selected_element:
-			self.selected_element.set_highlight(False)
-			self.selected_element = None
+			self.selected_element = elem
+			selection.set([elem])
+			return
+
+		# 空白处按下：清空选择，拖出橡皮筋框
+		selection.clear()
+		self.selected_element = None
+		self.band_start = (x, y)
+
+	def update_band(self, x, y):
+		x0, y0 = self.band_start
+		if self.band is None:
+			self.band = self.canvas.create_rectangle(x0, y0, x, y,
+				outline=COLORS['highlight'], dash=(4, 2), width=1)
+		else:
+			self.canvas.coords(self.band, x0, y0, x, y)
+
+	def finish_band(self, x, y):
+		# 框选：从空间索引取与框相交的元素，只保留完全落在框内的顶层对象
+		x0, y0 = self.band_start
+		self.band_start = None
+		if self.band is None:
+			return
+		self.canvas.delete(self.band)
+		self.band = None
+		x1, x2 = sorted((x0, x))
+		y1, y2 = sorted((y0, y))
+		found = [elem for elem in self.index.query_rect(x1, y1, x2, y2)
+			if elem.parent is None and x1 <= elem.x and elem.x + elem.width <= x2
+			and y1 <= elem.y and elem.y + elem.height <= y2]
+		found.sort(key=self.index.paint_order)
+		selection = self.board.selection
+		for elem in found:
+			selection.add(elem)
+		if self.selected_element is None and found:
+			self.selected_element = found[-1]
+
+	def multi_drag(self):
+		selection = self.board.selection
+		return len(selection) > 1 and self.selected_element in selection
 
 	def on_drag(self, event):
 				
+		x, y = self.point(event)
+		if self.band_start is not None:
+			self.update_band(x, y)
+			return
 		if self.dragging_pointer and isinstance(self.selected_element, PointerCell):
-			for elem in self.get_all_elements():
-				if elem != self.selected_element and elem.contains(event.x, event.y):
+			for elem in self.index.hits(x, y):
+				if elem != self.selected_element:
 					self.selected_element.create_arrow(elem)
 					return
 			if self.selected_element.arrow:
-				self.canvas.delete(self.selected_element.arrow)
-				self.selected_element.arrow = None
-				if self.selected_element.target:
-					self.selected_element.target.pointers.remove(self.selected_element)
-					self.selected_element.target = None
+				self.selected_element.clear_arrow()
 			return
 		
-		if self.selected_element and self.selected_element.parent is not None:
+		if self.selected_element and self.selected_element.parent is not None and not self.multi_drag():
 			return
 		
 		if self.selected_element:
-			dx = event.x - self.drag_start[0]
-			dy = event.y - self.drag_start[1]
-			self.selected_element.move(dx, dy)
-			self.drag_start = (event.x, event.y)
+			# 只累加位移，由定时器每帧应用一次，高频鼠标事件不会堆积
+			dx, dy = self.drag_delta
+			self.drag_delta = (dx + x - self.drag_start[0], dy + y - self.drag_start[1])
+			self.drag_start = (x, y)
+			if self.drag_pending is None:
+				self.drag_pending = self.canvas.after(self.DRAG_FRAME_MS, self.apply_drag)
+
+	def apply_drag(self):
+		self.drag_pending = None
+		dx, dy = self.drag_delta
+		self.drag_delta = (0, 0)
+		elem = self.selected_element
+		if not elem or not (dx or dy):
+			return
+		multi = self.multi_drag()
+		if self.outline_drag:
+			# 拖影模式：拖动中只移动一个虚线外框，松开时整棵子树再移动一次
+			if self.proxy is None:
+				group = self.board.selection.roots() if multi else [elem]
+				self.proxy = self.canvas.create_rectangle(
+					min(e.x for e in group), min(e.y for e in group),
+					max(e.x + e.width for e in group), max(e.y + e.height for e in group),
+					outline=COLORS['highlight'], dash=(4, 2), width=2)
+			self.canvas.move(self.proxy, dx, dy)
+			px, py = self.proxy_delta
+			self.proxy_delta = (px + dx, py + dy)
+		elif multi:
+			# 多选：所有选中对象一次 canvas.move
+			self.board.selection.move(dx, dy)
+		else:
+			elem.move(dx, dy)
+
+	def finish_drag(self):
+		if self.drag_pending is not None:
+			self.canvas.after_cancel(self.drag_pending)
+			self.apply_drag()
+		if self.proxy is not None:
+			self.canvas.delete(self.proxy)
+			self.proxy = None
+			dx, dy = self.proxy_delta
+			self.proxy_delta = (0, 0)
+			if self.multi_drag():
+				self.board.selection.move(dx, dy)
+			elif self.selected_element:
+				self.selected_element.move(dx, dy)
+
+	def toggle_outline_drag(self):
+		self.outline_drag = not self.outline_drag
+
+	def toggle_reachability(self):
+		# 打开后从根（没有被指向的顶层元素）出发不可达的对象高亮，随编辑实时更新
+		analysis = self.board.reachability
+		if analysis.active:
+			analysis.stop()
+			return
+		analysis.start()
+		messagebox.showinfo("Reachability",
+			f"{len(analysis.garbage)} unreachable objects, {len(analysis.cycles())} cycles")
 
 	def on_release(self, event):
 		
+		self.history.end()
+		if self.band_start is not None:
+			self.finish_band(*self.point(event))
+			return
+		self.finish_drag()
 		tmp=self.dragging_pointer
 		
 		self.dragging_pointer = False
-		if not self.selected_element or self.dragging_pointer:
+		if not self.selected_element or self.dragging_pointer or self.multi_drag():
 			return
 		
 		target_struct = None
-		for elem in self.elements:
-			if elem != self.selected_element and elem.contains(event.x, event.y) and isinstance(elem, Volume):
+		for elem in self.index.hits(*self.point(event)):
+			if elem != self.selected_element and elem.parent is None and isinstance(elem, Volume):
 				target_struct = elem
 				break
 		
 		if target_struct and not tmp:
-			
+			if isinstance(target_struct, StackQueue):
+				# 入栈/入队按动画播放
+				self.board.animator.push(target_struct, self.selected_element)
+				return
 			target_struct.add_element(self.selected_element)
 			if self.selected_element in self.elements:
 				self.elements.remove(self.selected_element)
@@ -658,134 +4838,124 @@ class DataStructureCanvas:
 				pass
 
 	def on_double_click(self, event):
-		for elem in reversed(self.get_all_elements()):
-			if elem.contains(event.x, event.y):
-				if isinstance(elem, DataCell):
-					elem.rename_and_edit_value()
-				elif isinstance(elem, StackQueue):
-					popped = elem.remove_element()
-					if popped:
-						popped.x = elem.x + elem.width + 20
-						popped.y = elem.y
-						self.elements.append(popped)
-						popped.draw()
-				else:
-					elem.rename()
-				break
+		elem = self.index.hit(*self.point(event))
+		if not elem:
+			return
+		if isinstance(elem, DataCell):
+			elem.rename_and_edit_value()
+		elif isinstance(elem, StackQueue):
+			self.board.animator.pop(elem)
+		else:
+			elem.rename()
 
 	def on_right_click(self, event):
-		for elem in self.elements:
-			if elem.contains(event.x, event.y):
+		self.right_click_pos = self.point(event)
+		for elem in self.index.hits(*self.point(event)):
+			if elem.parent is None:
 				self.selected_element = elem
 				elem.show_context_menu(event)
 				return
 		self.blank_menu.post(event.x_root, event.y_root)
 
-	def paste_element(self):
+	def copy_selection(self, event=None):
+		# 剪贴板里存的是模型记录，之后原元素被修改或删除都不影响粘贴
+		if len(self.board.selection):
+			self.clipboard = self.board.selection.copy_records()
+
+	def paste_element(self, event=None, at=(None, None)):
+		# 右键菜单粘贴到点击处，按钮与快捷键粘贴到原位置右下方；粘贴出的对象成为新的选择
 		if self.clipboard:
-			new_elem = copy.deepcopy(self.clipboard)
-			new_elem.x = self.drag_start[0]
-			new_elem.y = self.drag_start[1]
-			new_elem.draw()
-			self.elements.append(new_elem)
+			pasted = self.board.paste(self.clipboard, *at)
+			self.board.selection.set(pasted)
+			self.selected_element = pasted[-1] if pasted else None
+
+	def delete_selection(self, event=None):
+		self.board.selection.delete()
+		self.selected_element = None
+
+	def wrap_selection(self):
+		self.selected_element = self.board.selection.wrap()
+
+	def undo(self, event=None):
+		self.board.animator.finish()
+		self.history.undo()
+		self.drop_stale_selection()
+
+	def redo(self, event=None):
+		self.board.animator.finish()
+		self.history.redo()
+		self.drop_stale_selection()
+
+	def drop_stale_selection(self):
+		self.board.selection.prune()
+		if self.selected_element and self.selected_element not in self.index:
+			self.selected_element = None
 
 	def clear_canvas(self):
-		for elem in self.elements.copy():
-			elem.delete()
-		self.elements.clear()
+		self.board.clear()
+		self.drop_stale_selection()
+
+	def add_new(self, elem):
+		return self.board.add_new(elem)
 
 	def create_data_cell(self):
-		self.elements.append(DataCell(self.canvas, 100, 100))
+		self.add_new(DataCell(self.canvas, 100, 100))
 
 	def create_pointer_cell(self):
-		self.elements.append(PointerCell(self.canvas, 200, 100))
+		self.add_new(PointerCell(self.canvas, 200, 100))
 
 	def create_struct_block(self):
-		self.elements.append(StructBlock(self.canvas, 300, 100))
+		self.add_new(StructBlock(self.canvas, 300, 100))
 
 	def create_stack(self):
-		self.elements.append(StackQueue(self.canvas, 500, 100))
+		self.add_new(StackQueue(self.canvas, 500, 100))
 
 	def create_queue(self):
-		self.elements.append(StackQueue(self.canvas, 700, 100, "Queue", False))
-	def save_to_file(self, filename):
-		def collect_elements(elements):
-			data = []
-			for elem in elements:
-				elem_data = elem.to_dict()
-				if isinstance(elem, Volume):
-					elem_data["elements"] = collect_elements(elem.elements)
-				data.append(elem_data)
-			return data
-		
-		elements_data = collect_elements(self.elements)
-		with open(filename, 'w') as f:
-			json.dump(elements_data, f, indent=2)
-
-	def load_from_file(self, filename):
-		self.clear_canvas()
-		with open(filename, 'r') as f:
-			elements_data = json.load(f)
+		self.add_new(StackQueue(self.canvas, 700, 100, "Queue", False))
+	def save_to_file(self, filename, compact=False):
+		self.board.save_to_file(filename, compact)
 
-		uuid_map = {}
-		all_elements = []
-		
-		tmp={}
-		
-		def create_element(data):
-			elem_type = data.get('type')
-			if elem_type == 'DataCell':
-				elem = DataCell.from_dict(data, self.canvas)
-			elif elem_type == 'PointerCell':
-				elem = PointerCell.from_dict(data, self.canvas)
-				tmp[data.get('uuid')]=data.get('target_uuid')
-			elif elem_type == 'StructBlock':
-				elem = StructBlock.from_dict(data, self.canvas)
-			elif elem_type == 'StackQueue':
-				elem = StackQueue.from_dict(data, self.canvas)
-			elif elem_type == 'Volume':
-				elem = Volume.from_dict(data, self.canvas)
-			else:
-				return None
-			uuid_map[data['uuid']] = elem
-			all_elements.append(elem)
-			if 'elements' in data:
-				for child_data in data['elements']:
-					child = create_element(child_data)
-					if child:
-						elem.add_element(child)
-			return elem
-
-		for data in elements_data:
-			create_element(data)
-
-		for elem in all_elements:
-			if isinstance(elem, PointerCell):
-				
-				target_uuid = tmp[ elem.uuid ]
-				#print(target_uuid)
-				if target_uuid:
-					#print(elem.name+' -> '+uuid_map.get(target_uuid).name)
-					elem.create_arrow(uuid_map.get(target_uuid))
-					
-
-		self.elements = [elem for elem in all_elements if not elem.parent]
-		self.refresh_all()
+	def load_from_file(self, filename, progress=None):
+		self.board.load_from_file(filename, progress)
+		self.drop_stale_selection()
+		if self.journal is not None:
+			self.journal.rebase(filename)
 
 	def save(self):
 		filename = filedialog.asksaveasfilename(
 			defaultextension=".json",
-			filetypes=[("JSON Files", "*.json")]
+			filetypes=[("JSON Files", "*.json"), ("Binary Board", "*" + BINARY_EXTENSION)]
 		)
 		if filename:
 			self.save_to_file(filename)
 
+	def export(self):
+		filename = filedialog.asksaveasfilename(defaultextension=".svg",
+			filetypes=[("SVG", "*.svg"), ("PNG", "*.png"), ("PDF", "*.pdf")])
+		if not filename:
+			return
+		fmt = os.path.splitext(filename)[1][1:].lower()
+		try:
+			data = render_board(self.board, fmt if fmt in EXPORT_FORMATS else 'svg')
+		except (ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+			messagebox.showerror("Export", str(e))
+			return
+		write_export(filename, data)
+
 	def load(self):
 		filename = filedialog.askopenfilename(
-			filetypes=[("JSON Files", "*.json")]
+			filetypes=[("JSON Files", "*.json"), ("Binary Board", "*" + BINARY_EXTENSION)]
 		)
 		if filename:
-			self.load_from_file(filename)
+			title = self.root.title()
+			def progress(fraction):
+				self.root.title(f"{title} - Loading {fraction:.0%}")
+				self.root.update_idletasks()
+			try:
+				large = os.path.getsize(filename) > (8 << 20)
+				self.load_from_file(filename, progress if large else None)
+			finally:
+				self.root.title(title)
 
 	def create_control_panel(self):
 		control_frame = ttk.Frame(self.root)
@@ -796,10 +4966,19 @@ class DataStructureCanvas:
 		ttk.Button(control_frame, text="Struct Block", command=self.create_struct_block).pack(side=tk.LEFT)
 		ttk.Button(control_frame, text="Stack", command=self.create_stack).pack(side=tk.LEFT)
 		ttk.Button(control_frame, text="Queue", command=self.create_queue).pack(side=tk.LEFT)
+
+		# 动画控制：播放、暂停、单步、调速
+		animator = self.board.animator
+		ttk.Button(control_frame, text="Play", command=animator.play).pack(side=tk.LEFT)
+		ttk.Button(control_frame, text="Pause", command=animator.pause).pack(side=tk.LEFT)
+		ttk.Button(control_frame, text="Step", command=animator.step).pack(side=tk.LEFT)
+		ttk.Button(control_frame, text="Slower", command=lambda: animator.set_speed(animator.speed / 2)).pack(side=tk.LEFT)
+		ttk.Button(control_frame, text="Faster", command=lambda: animator.set_speed(animator.speed * 2)).pack(side=tk.LEFT)
 		
 		# 新增保存和载入按钮
 		ttk.Button(control_frame, text="Save", command=self.save).pack(side=tk.RIGHT)
 		ttk.Button(control_frame, text="Load", command=self.load).pack(side=tk.RIGHT)
+		ttk.Button(control_frame, text="Export", command=self.export).pack(side=tk.RIGHT)
 		
 		
 		
@@ -808,22 +4987,20 @@ class DataStructureCanvas:
 		ttk.Button(control_frame1, text="Clear", command=self.clear_canvas).pack(side=tk.RIGHT)
 		ttk.Button(control_frame1, text="Refresh", command=self.refresh_all).pack(side=tk.RIGHT)
 		ttk.Button(control_frame1, text="Toggle Grid", command=self.toggle_grid).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Zoom Out", command=self.zoom_out).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Outline Drag", command=self.toggle_outline_drag).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Reachability", command=self.toggle_reachability).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Auto Layout", command=self.board.auto_layout.start).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Zoom In", command=self.zoom_in).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Redo", command=self.redo).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Undo", command=self.undo).pack(side=tk.RIGHT)
 
-		ttk.Button(control_frame1, text="Copy", command=  lambda:self.safe("copy")   ).pack(side=tk.RIGHT)
-		ttk.Button(control_frame1, text="Delete", command=lambda:self.safe("delete") ).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Paste", command=self.paste_element).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Copy", command=self.copy_selection).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Delete", command=self.delete_selection).pack(side=tk.RIGHT)
+		ttk.Button(control_frame1, text="Wrap", command=self.wrap_selection).pack(side=tk.RIGHT)
 		
 
-	def safe(self,func):
-		try:
-			if(func=='copy'):
-				self.selected_element.copy()
-			else:
-				self.selected_element.delete()
-		except:
-			pass
-	
-	
-	
 	def create_rounded_rectangle(self, x1, y1, x2, y2, **kwargs):
 		self.radius=5
 		points = [
@@ -885,7 +5062,55 @@ class DataStructureCanvas:
 				self.canvas.itemconfig(new_item, tags=config['tags'])
 
 
-if __name__ == "__main__":
+def main(argv=None):
+	# 不带参数时打开窗口；build 子命令按 JSON 描述无界面建板并保存，export 子命令把存档批量导出为图片
+	parser = argparse.ArgumentParser(description="Data structure whiteboard")
+	commands = parser.add_subparsers(dest='command')
+	build = commands.add_parser('build', help="build a board from a JSON description and save it")
+	build.add_argument('spec', help='JSON file with one or a list of {"type": ...} items, "-" for stdin')
+	build.add_argument('-o', '--output', required=True, help="board file to write (.json or " + BINARY_EXTENSION + ")")
+	build.add_argument('--layout', choices=['none', 'auto', 'tree', 'layered', 'force'], default='none',
+		help="run auto layout over the whole board before saving")
+	export = commands.add_parser('export', help="render board files to SVG, PNG or PDF without a display")
+	export.add_argument('sources', nargs='+', help="board files or directories of board files")
+	export.add_argument('-o', '--outdir', help="directory for the exported files (default: next to each source)")
+	export.add_argument('-f', '--format', choices=EXPORT_FORMATS, default='svg')
+	export.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+	args = parser.parse_args(argv)
+
+	if args.command == 'build':
+		board = Board()
+		try:
+			# 读不到、不是 JSON、结构不对或布局失败都按用法错误报告（退出码 2）
+			if args.spec == '-':
+				spec = json.load(sys.stdin)
+			else:
+				with open(args.spec) as f:
+					spec = json.load(f)
+			board.build(spec)
+			if args.layout != 'none':
+				board.auto_layout.arrange(args.layout)
+		except (OSError, TypeError, ValueError, KeyError) as e:
+			parser.error(f"{args.spec}: {e}")
+		board.save_to_file(args.output)
+		return
+
+	if args.command == 'export':
+		results = export_boards(args.sources, args.outdir, args.format, args.jobs)
+		failed = [(src, error) for src, error in results if error]
+		for src, error in failed:
+			print(f"{src}: {error}", file=sys.stderr)
+		print(f"exported {len(results) - len(failed)} of {len(results)} boards")
+		if failed:
+			sys.exit(1)
+		return
+
+	if tk is None:
+		parser.error("tkinter is not available; only the build and export commands can run")
 	root = tk.Tk()
-	app = DataStructureCanvas(root)
-	root.mainloop()
\ No newline at end of file
+	DataStructureCanvas(root)
+	root.mainloop()
+
+
+if __name__ == "__main__":
+	main()
\ No newline at end of file